@@ -1,20 +1,38 @@
 import asyncio
+import base64
+import binascii
 import json
 import math
 import os
 import random
 import re
+import time
+from contextlib import asynccontextmanager
+from datetime import date
 from typing import Optional
 
 import psycopg2
 import socketio
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from psycopg2.extras import RealDictCursor
 from pydantic import BaseModel
 
+from backplane import PgBackplane
+from broadcast import Broadcaster
+from cache import ResponseCache
+from clicks import ClickAggregator
+from counts import SearchCountCache, estimate_rows
+from db_pool import ConnectionPool
+from keywords import STATS_CATEGORIES
+from migrations import migrate
+from sampling import QuoteSampler
+from textsearch import TS_CONFIG
+from leaderboard import Leaderboard
+from payloads import EncodedPayload
+
 load_dotenv()
 
 # ---------------------------------------------------------------------------
@@ -22,16 +40,71 @@ load_dotenv()
 # ---------------------------------------------------------------------------
 VIDEOS_PER_PAGE = 24
 QUOTES_PER_PAGE = 10
-GREM_WORDS = ["Grem", "Grems"]
-CECE_WORDS = ["Cecilia", "Cece"]
-YAOI_WORDS = ["Yaoi"]
-YIPPEE_WORDS = ["Yippee"]
-SIXSEVEN_WORDS = ["6 7", "Six Seven"]
+RANDOM_QUOTES_COUNT = 10
+TRANSCRIPT_WINDOW_MAX_S = 1800      # widest [t - before, t + after] span one request may ask for
+TRANSCRIPT_WINDOW_MAX_LINES = 500   # row cap per window / per side in `lines` mode
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+CLICK_FLUSH_MS = int(os.getenv("CLICK_FLUSH_MS", "250"))
+SSE_MAX_RATE_HZ = float(os.getenv("SSE_MAX_RATE_HZ", "10"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "8"))
+BACKPLANE_ENABLED = os.getenv("BACKPLANE_ENABLED", "1") == "1"
+LEADERBOARD_SIZE = 10
+LEADERBOARD_RECONCILE_S = int(os.getenv("LEADERBOARD_RECONCILE_S", "300"))
+SEARCH_COUNT_CAP = int(os.getenv("SEARCH_COUNT_CAP", "1000"))
+SEARCH_COUNT_REFRESH_S = int(os.getenv("SEARCH_COUNT_REFRESH_S", "300"))
+COUNT_MODES = ("auto", "exact", "capped", "estimate")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_S = int(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256"))
+
+# ---------------------------------------------------------------------------
+# DB pool — shared by every route, opened/closed with the app lifecycle
+# ---------------------------------------------------------------------------
+db_pool = ConnectionPool(
+    os.getenv("DATABASE_URL"),
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+)
+
+
+def run_migrations():
+    # Serialized across workers by an advisory lock; a no-op once applied
+    with db_pool.connection() as conn:
+        migrate(conn)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_pool.open()
+    await db_pool.run(run_migrations)
+    await leaderboard.start()
+    await response_cache.start()
+    if backplane:
+        await backplane.start()
+    click_aggregator.start()
+    broadcaster.start()
+    search_counts.start()
+    try:
+        yield
+    finally:
+        # Flush buffered clicks before the pool goes away
+        await click_aggregator.stop()
+        await broadcaster.stop()
+        await search_counts.stop()
+        await response_cache.stop()
+        if backplane:
+            await backplane.stop()
+        await leaderboard.stop()
+        db_pool.close()
+
 
 # ---------------------------------------------------------------------------
 # App + CORS
 # ---------------------------------------------------------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,19 +119,13 @@ app.add_middleware(
 sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
 socket_app = socketio.ASGIApp(sio, other_asgi_app=app)
 
-# ---------------------------------------------------------------------------
-# SSE subscribers: dict keyed by user_uuid so we can push per-user payloads
-# ---------------------------------------------------------------------------
-# { user_uuid: [queue, queue, ...] }  (same user on multiple tabs → multiple queues)
-subscribers: dict[str, list[asyncio.Queue]] = {}
-
-
 # ---------------------------------------------------------------------------
 # DB helpers
 # ---------------------------------------------------------------------------
 
 def get_db_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+    """Borrow a pooled connection: `with get_db_connection() as conn: ...`"""
+    return db_pool.connection()
 
 
 def serialize_row(row):
@@ -69,10 +136,77 @@ def serialize_row(row):
     return result
 
 
+class ServerTiming:
+    """Collects per-phase durations for a `Server-Timing` response header."""
+
+    def __init__(self):
+        self.marks = []
+        self._last = time.perf_counter()
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.marks.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.marks)
+
+
 def strip_punctuation(text: str) -> str:
     return re.sub(r"[^\w\s,]", "", text)
 
 
+# upload_date is nullable; keyset pages order and compare on this instead, so
+# undated videos sort as the oldest and still get a usable cursor
+NULL_SORT_DATE = "-infinity"
+
+
+def sort_date_sql(alias: str = "") -> str:
+    prefix = f"{alias}." if alias else ""
+    return f"COALESCE({prefix}upload_date, '{NULL_SORT_DATE}'::date)"
+
+
+def _is_cursor_date(value) -> bool:
+    if value == NULL_SORT_DATE:
+        return True
+    try:
+        date.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_cursor_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63
+
+
+# Expected shape of each cursor field: anything else is a 400, not a SQL error
+CURSOR_FIELDS = {
+    "s": lambda v: isinstance(v, str),                     # sort order
+    "d": _is_cursor_date,                                  # upload date
+    "r": lambda v: (_is_cursor_int(v) or isinstance(v, float)) and math.isfinite(v),   # relevance
+    "i": _is_cursor_int,                                   # quote id
+    "v": lambda v: isinstance(v, str),                     # vod id
+}
+
+
+def encode_cursor(**fields) -> str:
+    """Opaque keyset-pagination token for the row a page ended on."""
+    raw = json.dumps(fields, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, *keys: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        fields = json.loads(raw)
+        if not isinstance(fields, dict) or not all(k in fields and CURSOR_FIELDS[k](fields[k]) for k in keys):
+            raise ValueError
+        return fields
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 def phrases_to_tsquery(input_str: str, operator: str = "&") -> Optional[str]:
     input_str = strip_punctuation(input_str)
     segments = [s.strip() for s in input_str.split(",") if s.strip()]
@@ -116,239 +250,552 @@ class GachaRollRequest(BaseModel):
 
 def get_global_data() -> dict:
     """Fetch data that is identical for every subscriber."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT value FROM global_stats WHERE stat_name = 'total_clicks'")
-    total = cur.fetchone()["value"]
-    cur.execute("SELECT username, clicks FROM users ORDER BY clicks DESC LIMIT 10")
-    leaders = cur.fetchall()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT value FROM global_stats WHERE stat_name = 'total_clicks'")
+        total = cur.fetchone()["value"]
     return {
         "total_clicks": total,
-        "leaderboard": [dict(l) for l in leaders],
+        "leaderboard": leaderboard.top(),
     }
 
 
-def get_user_data(user_uuid: str) -> dict:
-    """Fetch the personal stats for one user."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        "SELECT clicks, coins, gacha_pulls, inventory FROM users WHERE uuid = %s",
-        (user_uuid,),
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-    if not row:
-        return {}
+def get_users_data(user_uuids: list[str]) -> dict:
+    """Fetch the personal stats for several users in one query: { uuid: stats }."""
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT uuid, clicks, coins, gacha_pulls, inventory FROM users WHERE uuid = ANY(%s)",
+            (list(user_uuids),),
+        )
+        rows = cur.fetchall()
     return {
-        "user_clicks": row["clicks"],
-        "user_coins": row["coins"],
-        "user_gacha_pulls": row["gacha_pulls"],
-        "user_inventory": row["inventory"],
+        row["uuid"]: {
+            "user_clicks": row["clicks"],
+            "user_coins": row["coins"],
+            "user_gacha_pulls": row["gacha_pulls"],
+            "user_inventory": row["inventory"],
+            "user_rank": leaderboard.rank(row["uuid"]),
+        }
+        for row in rows
     }
 
 
-async def broadcast_update(target_uuid: str | None = None):
-    """
-    Push the latest state to SSE subscribers.
+# Top-K + rank lookups served from memory, kept current from click flushes
+leaderboard = Leaderboard(db_pool, top_k=LEADERBOARD_SIZE, reconcile_interval_s=LEADERBOARD_RECONCILE_S)
 
-    - target_uuid=None  → global broadcast to everyone (e.g. after any click)
-    - target_uuid=<id>  → also refreshes that user's personal payload
-    """
-    global_data = get_global_data()
-    active_players = sum(len(qs) for qs in subscribers.values())
-
-    for uuid, queues in list(subscribers.items()):
-        # Build a payload: shared global data + per-user data for this uuid
-        user_data = get_user_data(uuid) if uuid == target_uuid else {}
-        payload = {
-            **global_data,
-            "active_players": active_players,
-            **user_data,  # empty dict for other users — frontend ignores missing keys
-        }
-        for q in list(queues):
-            try:
-                await q.put(payload)
-            except Exception:
-                queues.remove(q)
+# Cross-worker events (clicks, presence, chat) ride on Postgres LISTEN/NOTIFY
+backplane = PgBackplane(os.getenv("DATABASE_URL"), db_pool) if BACKPLANE_ENABLED else None
+
+# Coalesced fan-out: at most SSE_MAX_RATE_HZ frames/sec, serialized once per tick
+broadcaster = Broadcaster(
+    db_pool,
+    fetch_global=get_global_data,
+    fetch_users=get_users_data,
+    max_rate_hz=SSE_MAX_RATE_HZ,
+    queue_size=SSE_QUEUE_SIZE,
+    remote_players=backplane.remote_players if backplane else None,
+)
+
+
+async def on_clicks_flushed(updated: list[tuple]):
+    for user_uuid, username, clicks in updated:
+        leaderboard.set_clicks(user_uuid, clicks, username)
+    broadcaster.mark_dirty(user_uuid for user_uuid, _, _ in updated)
+    if backplane:
+        await backplane.publish_items("clicks", "users", updated)
+
+
+async def on_remote_clicks(message: dict):
+    # Another worker flushed clicks: refresh totals for everyone, personal stats for its users
+    updated = message.get("users", [])
+    for user_uuid, username, clicks in updated:
+        leaderboard.set_clicks(user_uuid, clicks, username)
+    broadcaster.mark_dirty(user_uuid for user_uuid, _, _ in updated)
+
+
+async def on_remote_username(message: dict):
+    leaderboard.set_username(message["uuid"], message["username"])
+    broadcaster.mark_dirty()
+
+
+async def on_remote_chat(message: dict):
+    await sio.emit("chat_message", message.get("data"))
+
+
+if backplane:
+    backplane.on("clicks", on_remote_clicks)
+    backplane.on("username", on_remote_username)
+    backplane.on("chat", on_remote_chat)
+    backplane.track_presence(lambda: broadcaster.local_players, on_change=broadcaster.mark_dirty)
+
+
+# Clicks are written in batches; each flush pushes fresh stats to the clickers
+click_aggregator = ClickAggregator(db_pool, flush_interval_ms=CLICK_FLUSH_MS, on_flush=on_clicks_flushed)
+
+
+def count_quote_matches(key: tuple) -> int:
+    """Exact number of quotes matching a (tsquery phrases, vod_id) search."""
+    phrases, vod_id = key
+    conditions = []
+    if vod_id:
+        conditions.append("v.vod_id = %(vod_id)s")
+    if phrases:
+        conditions.append(f"q.content_tsv @@ websearch_to_tsquery('{TS_CONFIG}', %(phrases)s)")
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT COUNT(*) FROM quotes q JOIN video_catalog v ON q.vod_id = v.vod_id {where}",
+            {"phrases": phrases, "vod_id": vod_id},
+        )
+        return cur.fetchone()[0]
+
+
+# Random quotes by primary-key sampling instead of ORDER BY RANDOM()
+quote_sampler = QuoteSampler(db_pool)
+
+# Exact totals for popular searches, recounted in the background
+search_counts = SearchCountCache(db_pool, count_quote_matches, refresh_interval_s=SEARCH_COUNT_REFRESH_S)
+
+# Read endpoints are cached until the ingest pipeline bumps the data version
+response_cache = ResponseCache(
+    db_pool,
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl_s=RESPONSE_CACHE_TTL_S,
+    max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+)
+response_cache.on_invalidate(search_counts.invalidate)
+response_cache.on_invalidate(quote_sampler.invalidate)
+
+
+async def on_data_version(message: dict):
+    response_cache.set_version(int(message["version"]))
+
+
+if backplane:
+    backplane.on("data_version", on_data_version)
 
 
 # ---------------------------------------------------------------------------
-# Routes — search / video / stats (unchanged)
+# Routes — search / video / stats
 # ---------------------------------------------------------------------------
 
-@app.get("/api/search")
-def search_api(
-    search: str = Query(default=""),
-    sort: str = Query(default="newest"),
-    page: int = Query(default=1, ge=1),
-    quotes_only: bool = Query(default=False),
-):
-    search_query = search.strip()
-    order_sql = "DESC" if sort == "newest" else "ASC"
-    offset = (page - 1) * QUOTES_PER_PAGE
-
+def parse_search(search_query) -> tuple:
+    """(tsquery phrases, vod id filter) for a raw search string; also the search count key."""
     id_match = re.search(r"([a-zA-Z0-9_-]{11})", search_query)
     id_filter = id_match.group(1) if id_match else None
 
     phrase_input = re.sub(r"([a-zA-Z0-9_-]{11})", "", search_query).strip().strip(",")
     phrase_input = strip_punctuation(phrase_input)
-    ts_query_phrases = phrases_to_tsquery(phrase_input, "|")
-
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    video_results = []
-    if not quotes_only:
-        v_conditions, v_params = [], []
-        if id_filter:
-            v_conditions.append("v.vod_id = %s")
-            v_params.append(id_filter)
-        elif ts_query_phrases:
-            v_conditions.append("v.title_tsv @@ websearch_to_tsquery('simple', %s)")
-            v_params.append(ts_query_phrases)
-
-        v_where = ""
-        if v_conditions:
-            joiner = " AND " if id_filter else " OR "
-            v_where = " WHERE " + joiner.join(v_conditions)
+    return phrases_to_tsquery(phrase_input, "|"), id_filter
 
-        cur.execute(
-            f"SELECT * FROM video_catalog v {v_where} ORDER BY upload_date {order_sql}",
-            v_params,
-        )
-        video_results = cur.fetchall()
 
-    q_conditions, q_params = [], []
+def run_search(search_query, sort, page, quotes_only, cursor, include_total, count, timing) -> dict:
+    order_sql = "DESC" if sort == "newest" else "ASC"
+    offset = (page - 1) * QUOTES_PER_PAGE
+
+    ts_query_phrases, id_filter = parse_search(search_query)
+
+    params = {
+        "phrases": ts_query_phrases,
+        "vod_id": id_filter,
+        "limit": QUOTES_PER_PAGE,
+        "offset": offset,
+        "count_cap": SEARCH_COUNT_CAP + 1,
+    }
+    if cursor:
+        after = decode_cursor(cursor, "s", "d", "r", "i")
+        if after["s"] != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        params.update(offset=0, c_date=after["d"], c_rel=after["r"], c_id=after["i"])
+
+    v_conditions = []
     if id_filter:
-        q_conditions.append("v.vod_id = %s")
-        q_params.append(id_filter)
+        v_conditions.append("v.vod_id = %(vod_id)s")
+    elif ts_query_phrases:
+        v_conditions.append("v.title_tsv @@ p.tsq")
+    v_where = " WHERE " + " AND ".join(v_conditions) if v_conditions else ""
 
-    rank_alias = "1"
+    q_conditions = []
+    if id_filter:
+        q_conditions.append("v.vod_id = %(vod_id)s")
     if ts_query_phrases:
-        q_conditions.append("q.content_tsv @@ websearch_to_tsquery('simple', %s)")
-        q_params.append(ts_query_phrases)
-        rank_alias = "ts_rank(q.content_tsv, websearch_to_tsquery('simple', %s))"
-        q_params.insert(0, ts_query_phrases)
-
+        q_conditions.append("q.content_tsv @@ p.tsq")
+    count_where = " WHERE " + " AND ".join(q_conditions) if q_conditions else ""
+    rank_expr = "ts_rank(q.content_tsv, p.tsq)" if ts_query_phrases else "1"
+    if cursor:
+        # Rows strictly after the cursor in (upload_date, relevance DESC, id DESC) order.
+        # Relevance is compared as real, the type ts_rank returns, so it round-trips exactly.
+        date_op = "<" if order_sql == "DESC" else ">"
+        q_conditions.append(f"""(
+            {sort_date_sql("v")} {date_op} %(c_date)s::date
+            OR ({sort_date_sql("v")} = %(c_date)s::date AND (
+                {rank_expr} < %(c_rel)s::real
+                OR ({rank_expr} = %(c_rel)s::real AND q.id < %(c_id)s)
+            ))
+        )""")
     q_where = " WHERE " + " AND ".join(q_conditions) if q_conditions else ""
 
-    cur.execute(
-        f"SELECT COUNT(*) FROM quotes q JOIN video_catalog v ON q.vod_id = v.vod_id {q_where}",
-        q_params[1:] if ts_query_phrases else q_params,
-    )
-    total_quotes = cur.fetchone()["count"]
-
-    quote_sql = f"""
-        SELECT v.*, q.content, q.start_time as time, {rank_alias} as relevance
-        FROM video_catalog v
-        JOIN quotes q ON v.vod_id = q.vod_id
-        {q_where}
-        ORDER BY v.upload_date {order_sql}, relevance DESC
-        LIMIT %s OFFSET %s
+    match_sql = f"""
+        SELECT 1 FROM quotes q
+        JOIN video_catalog v ON q.vod_id = v.vod_id
+        CROSS JOIN params p
+        {count_where}
     """
-    cur.execute(quote_sql, q_params + [QUOTES_PER_PAGE, offset])
-    quote_results = cur.fetchall()
-
-    cur.close()
-    conn.close()
+    count_sql = f"(SELECT COUNT(*) FROM ({match_sql}) matches)"
+
+    count_mode = count if include_total else None
+    cached_total = None
+    if count_mode == "auto":
+        cached_total = search_counts.get((ts_query_phrases, id_filter))
+        count_mode = None if cached_total is not None else "capped"
+
+    # Exact totals ride along the page as a window count; after a cursor the
+    # page no longer sees the earlier rows, so they are counted separately.
+    window_sql = ""
+    if count_mode == "exact" and cursor:
+        total_sql = count_sql
+    elif count_mode == "exact":
+        total_sql = "(SELECT MAX(total) FROM page)"
+        window_sql = ", COUNT(*) OVER () AS total"
+    elif count_mode == "capped":
+        total_sql = f"(SELECT COUNT(*) FROM ({match_sql} LIMIT %(count_cap)s) matches)"
+    else:
+        total_sql = "NULL::bigint"
+
+    # One statement, one round trip: the tsquery is parsed once in `params`, the
+    # quote page carries its total as a window count, and quote + video result
+    # sets come back as JSON arrays on a single row.
+    videos_sql = "'[]'::json" if quotes_only else f"""(
+        SELECT COALESCE(json_agg(v ORDER BY v.upload_date {order_sql}), '[]'::json)
+        FROM video_catalog v CROSS JOIN params p
+        {v_where}
+    )"""
+    sql = f"""
+        WITH params AS MATERIALIZED (
+            SELECT websearch_to_tsquery('{TS_CONFIG}', %(phrases)s) AS tsq
+        ),
+        page AS (
+            SELECT q.id AS quote_id, q.vod_id, q.content, q.start_time AS time,
+                   {rank_expr} AS relevance, v.upload_date{window_sql}
+            FROM quotes q
+            JOIN video_catalog v ON q.vod_id = v.vod_id
+            CROSS JOIN params p
+            {q_where}
+            ORDER BY {sort_date_sql("v")} {order_sql}, relevance DESC, q.id DESC
+            LIMIT %(limit)s OFFSET %(offset)s
+        )
+        SELECT
+            {total_sql} AS total_quotes,
+            (
+                SELECT COALESCE(
+                    json_agg(r ORDER BY {sort_date_sql("r")} {order_sql}, r.relevance DESC, r.quote_id DESC),
+                    '[]'::json
+                )
+                FROM (
+                    SELECT v.*, page.quote_id, page.content, page.time, page.relevance
+                    FROM page JOIN video_catalog v ON v.vod_id = page.vod_id
+                ) r
+            ) AS quote_results,
+            {videos_sql} AS video_results
+    """
+    timing.mark("parse")
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        timing.mark("pool")
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        total_quotes = row["total_quotes"]
+        total_is_approximate = False
+        if cached_total is not None:
+            total_quotes = cached_total
+        elif count_mode == "capped" and total_quotes > SEARCH_COUNT_CAP:
+            total_quotes, total_is_approximate = SEARCH_COUNT_CAP, True
+        elif count_mode == "estimate":
+            total_quotes = estimate_rows(
+                cur,
+                f"WITH params AS (SELECT websearch_to_tsquery('{TS_CONFIG}', %(phrases)s) AS tsq) {match_sql}",
+                params,
+            )
+            total_is_approximate = True
+        elif count_mode == "exact" and total_quotes is None:
+            # Past the last page the window count has no rows to ride on
+            cur.execute(
+                f"""
+                WITH params AS (SELECT websearch_to_tsquery('{TS_CONFIG}', %(phrases)s) AS tsq)
+                SELECT {count_sql} AS count
+                """,
+                params,
+            )
+            total_quotes = cur.fetchone()["count"]
+        timing.mark("db")
+
+    quote_results = row["quote_results"]
+    next_cursor = None
+    if len(quote_results) == QUOTES_PER_PAGE:
+        last = quote_results[-1]
+        next_cursor = encode_cursor(
+            s=sort, d=last["upload_date"] or NULL_SORT_DATE, r=last["relevance"], i=last["quote_id"]
+        )
 
-    return {
-        "video_results": [serialize_row(r) for r in video_results],
-        "quote_results": [serialize_row(r) for r in quote_results],
+    result = {
+        "video_results": row["video_results"],
+        "quote_results": quote_results,
         "total_quotes": total_quotes,
-        "total_pages": math.ceil(total_quotes / QUOTES_PER_PAGE),
+        "total_pages": math.ceil(total_quotes / QUOTES_PER_PAGE) if total_quotes is not None else None,
+        "total_is_approximate": total_is_approximate,
+        "next_cursor": next_cursor,
+    }
+    timing.mark("serialize")
+    return result
+
+
+@app.get("/api/search")
+def search_api(
+    response: Response,
+    search: str = Query(default=""),
+    sort: str = Query(default="newest"),
+    page: int = Query(default=1, ge=1),
+    quotes_only: bool = Query(default=False),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=True),
+    count: str = Query(default="auto"),
+):
+    """
+    Paginate either with `page` (OFFSET) or with the `next_cursor` token of the
+    previous response (keyset: upload_date, relevance, quote id), which stays an
+    index seek however deep the page is. `include_total=false` skips counting.
+
+    `count` picks how total_quotes is computed:
+      - exact     full COUNT of the match set
+      - capped    stop counting after SEARCH_COUNT_CAP matches ("1000+")
+      - estimate  planner row estimate, no scan at all
+      - auto      background-refreshed exact count for popular searches, else capped
+    `total_is_approximate` tells the client whether the total is exact.
+    """
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count must be one of {', '.join(COUNT_MODES)}")
+    timing = ServerTiming()
+    params = {
+        "search": " ".join(search.split()),
+        "sort": "newest" if sort == "newest" else "oldest",
+        "page": page if not cursor else 1,
+        "quotes_only": quotes_only,
+        "cursor": cursor,
+        "include_total": include_total,
+        "count": count,
     }
+    if include_total and count == "auto":
+        # Count demand here, not in run_search: cache hits are the popular searches
+        search_counts.record(parse_search(params["search"]))
+    result = response_cache.get_or_compute(
+        "search",
+        params,
+        lambda: run_search(
+            params["search"], params["sort"], page, quotes_only, cursor, include_total, count, timing
+        ),
+    )
+    timing.mark("cache")
+    response.headers["Server-Timing"] = timing.header()
+    return result
 
 
 @app.get("/api/random-quotes")
 def random_quotes_api():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT v.*, q.content, q.start_time as time
-        FROM quotes q
-        JOIN video_catalog v ON q.vod_id = v.vod_id
-        ORDER BY RANDOM()
-        LIMIT 10;
-    """)
-    random_quotes = cur.fetchall()
-    cur.close()
-    conn.close()
+    random_quotes = quote_sampler.sample(RANDOM_QUOTES_COUNT)
     return {"quotes": [serialize_row(q) for q in random_quotes]}
 
 
+def load_video_detail(vod_id: str) -> Optional[dict]:
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM video_catalog WHERE vod_id = %s", (vod_id,))
+        video = cur.fetchone()
+        if not video:
+            return None
+        cur.execute("SELECT * FROM quotes WHERE vod_id = %s ORDER BY start_time ASC", (vod_id,))
+        quotes = cur.fetchall()
+    return {"video": serialize_row(video), "quotes": [serialize_row(q) for q in quotes]}
+
+
+def load_video_payload(vod_id: str) -> Optional[EncodedPayload]:
+    detail = load_video_detail(vod_id)
+    return EncodedPayload(detail) if detail is not None else None
+
+
 @app.get("/api/video/{vod_id}")
-def video_detail_api(vod_id: str):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM video_catalog WHERE vod_id = %s", (vod_id,))
-    video = cur.fetchone()
-    if not video:
-        cur.close()
-        conn.close()
+def video_detail_api(vod_id: str, request: Request):
+    # Serialized, hashed and compressed once per data version; revalidation is a 304
+    payload = response_cache.get_or_compute("video", {"vod_id": vod_id}, lambda: load_video_payload(vod_id))
+    if payload is None:
         raise HTTPException(status_code=404, detail="Video not found")
-    cur.execute("SELECT * FROM quotes WHERE vod_id = %s ORDER BY start_time ASC", (vod_id,))
-    quotes = cur.fetchall()
-    cur.close()
-    conn.close()
-    return {"video": serialize_row(video), "quotes": [serialize_row(q) for q in quotes]}
+    return payload.respond(request)
+
+
+_WINDOW_COLUMNS = "id, vod_id, start_time, end_time, content"
+
+
+def load_transcript_window(vod_id: str, t: float, before: float, after: float, lines: Optional[int]) -> Optional[dict]:
+    """
+    Quotes near playback position `t`, either every line starting in
+    [t - before, t + after] or the `lines` lines either side of `t`.
+    Both shapes are range scans on quotes (vod_id, start_time).
+    """
+    params = {"vod_id": vod_id, "t": t}
+    if lines is not None:
+        # One extra row per side tells us whether there is more to load
+        params["limit"] = lines + 1
+        sql = f"""
+            WITH before AS (
+                SELECT {_WINDOW_COLUMNS} FROM quotes
+                WHERE vod_id = %(vod_id)s AND start_time < %(t)s
+                ORDER BY start_time DESC LIMIT %(limit)s
+            ), after AS (
+                SELECT {_WINDOW_COLUMNS} FROM quotes
+                WHERE vod_id = %(vod_id)s AND start_time >= %(t)s
+                ORDER BY start_time ASC LIMIT %(limit)s
+            )
+            SELECT COALESCE((SELECT json_agg(b ORDER BY b.start_time DESC) FROM before b), '[]') AS before,
+                   COALESCE((SELECT json_agg(a ORDER BY a.start_time ASC) FROM after a), '[]') AS after,
+                   EXISTS (SELECT 1 FROM video_catalog WHERE vod_id = %(vod_id)s) AS video_exists
+        """
+    else:
+        params.update(lo=max(0.0, t - before), hi=t + after, limit=TRANSCRIPT_WINDOW_MAX_LINES + 1)
+        sql = f"""
+            WITH win AS (
+                SELECT {_WINDOW_COLUMNS} FROM quotes
+                WHERE vod_id = %(vod_id)s AND start_time BETWEEN %(lo)s AND %(hi)s
+                ORDER BY start_time ASC LIMIT %(limit)s
+            )
+            SELECT COALESCE((SELECT json_agg(w ORDER BY w.start_time) FROM win w), '[]') AS quotes,
+                   EXISTS (SELECT 1 FROM quotes WHERE vod_id = %(vod_id)s AND start_time < %(lo)s) AS has_more_before,
+                   EXISTS (SELECT 1 FROM quotes WHERE vod_id = %(vod_id)s AND start_time > %(hi)s) AS has_more_after,
+                   EXISTS (SELECT 1 FROM video_catalog WHERE vod_id = %(vod_id)s) AS video_exists
+        """
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    if not row["video_exists"]:
+        return None
+
+    if lines is not None:
+        before_rows, after_rows = row["before"], row["after"]
+        quotes = before_rows[:lines][::-1] + after_rows[:lines]
+        has_more_before, has_more_after = len(before_rows) > lines, len(after_rows) > lines
+    else:
+        quotes = row["quotes"][:TRANSCRIPT_WINDOW_MAX_LINES]
+        has_more_before = row["has_more_before"]
+        has_more_after = row["has_more_after"] or len(row["quotes"]) > TRANSCRIPT_WINDOW_MAX_LINES
+
+    return {
+        "vod_id": vod_id,
+        "quotes": quotes,
+        # Where to anchor the next request when paging outwards
+        "start": quotes[0]["start_time"] if quotes else None,
+        "end": quotes[-1]["start_time"] if quotes else None,
+        "has_more_before": has_more_before,
+        "has_more_after": has_more_after,
+    }
+
+
+@app.get("/api/video/{vod_id}/window")
+def video_window_api(
+    vod_id: str,
+    t: float = Query(default=0.0, ge=0),
+    before: float = Query(default=60.0, ge=0),
+    after: float = Query(default=120.0, ge=0),
+    lines: Optional[int] = Query(default=None, ge=1, le=TRANSCRIPT_WINDOW_MAX_LINES),
+):
+    if lines is None and before + after > TRANSCRIPT_WINDOW_MAX_S:
+        raise HTTPException(status_code=400, detail=f"Window wider than {TRANSCRIPT_WINDOW_MAX_S}s")
+    # Not cached: nearly every playback position is a distinct key, and the
+    # query is a short index range scan anyway
+    window = load_transcript_window(vod_id, t, before, after, lines)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return window
+
+
+def load_videos_page(page: int, sort: str, cursor: Optional[str]) -> dict:
+    order_sql = "DESC" if sort == "newest" else "ASC"
+    limit = VIDEOS_PER_PAGE
+    offset = (page - 1) * limit
+
+    keyset_where, params = "", [limit, offset]
+    if cursor:
+        after = decode_cursor(cursor, "s", "d", "v")
+        if after["s"] != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        keyset_where = f"WHERE ({sort_date_sql()}, vod_id) {'<' if order_sql == 'DESC' else '>'} (%s::date, %s)"
+        params = [after["d"], after["v"], limit, 0]
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            f"""
+            SELECT * FROM video_catalog {keyset_where}
+            ORDER BY {sort_date_sql()} {order_sql}, vod_id {order_sql}
+            LIMIT %s OFFSET %s
+            """,
+            params,
+        )
+        videos = cur.fetchall()
+
+    next_cursor = None
+    if len(videos) == limit:
+        last = videos[-1]
+        next_cursor = encode_cursor(s=sort, d=last["upload_date"] or NULL_SORT_DATE, v=last["vod_id"])
+    return {"videos": [serialize_row(v) for v in videos], "next_cursor": next_cursor}
 
 
 @app.get("/api/videos")
 def get_videos_api(
     page: int = Query(default=1, ge=1),
     sort: str = Query(default="newest"),
+    cursor: Optional[str] = Query(default=None),
 ):
-    order_sql = "DESC" if sort == "newest" else "ASC"
-    limit = 24
-    offset = (page - 1) * limit
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        f"SELECT * FROM video_catalog ORDER BY upload_date {order_sql} LIMIT %s OFFSET %s",
-        (limit, offset),
+    sort = "newest" if sort == "newest" else "oldest"
+    return response_cache.get_or_compute(
+        "videos",
+        {"page": page if not cursor else 1, "sort": sort, "cursor": cursor},
+        lambda: load_videos_page(page, sort, cursor),
     )
-    videos = cur.fetchall()
-    cur.close()
-    conn.close()
-    return {"videos": [serialize_row(v) for v in videos]}
-
 
-@app.get("/api/stats")
-def get_stats():
-    categories = {
-        "grem": GREM_WORDS,
-        "cece": CECE_WORDS,
-        "yaoi": YAOI_WORDS,
-        "yippee": YIPPEE_WORDS,
-        "sixseven": SIXSEVEN_WORDS,
-    }
 
-    sql_parts, params = [], []
-    for key, words in categories.items():
-        pattern = "|".join([re.escape(w.lower()) for w in words])
-        regex_pattern = f"\\y(?:{pattern})\\y"
-        sql_parts.append(
-            f"SUM(COALESCE(ARRAY_LENGTH(REGEXP_SPLIT_TO_ARRAY(LOWER(content), %s), 1) - 1, 0)) AS {key}"
-        )
-        params.append(regex_pattern)
+def load_keyword_totals() -> dict:
+    # Counters are maintained at ingest/post-processing time (see keywords.py)
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT category, SUM(mentions) FROM keyword_stats GROUP BY category")
+        totals = dict(cur.fetchall())
+    return {key: int(totals.get(key) or 0) for key in STATS_CATEGORIES}
 
-    full_query = f"SELECT {', '.join(sql_parts)} FROM quotes;"
 
-    conn = get_db_connection()
+@app.get("/api/stats")
+def get_stats():
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(full_query, params)
-            row = cur.fetchone()
-            return {key: int(val or 0) for key, val in row.items()}
+        return response_cache.get_or_compute("stats", {}, load_keyword_totals)
     except Exception:
         raise HTTPException(status_code=500, detail="Internal server error")
-    finally:
-        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Monitoring
+# ---------------------------------------------------------------------------
+
+@app.get("/api/metrics")
+def get_metrics():
+    return {
+        "db_pool": db_pool.stats(),
+        "response_cache": response_cache.stats(),
+        "search_counts": search_counts.stats(),
+        "sse": {
+            "local_players": broadcaster.local_players,
+            "active_players": broadcaster.active_players,
+            "dropped_frames": broadcaster.dropped_frames,
+        },
+        "backplane": {
+            "worker_id": backplane.worker_id,
+            "published": backplane.published,
+            "received": backplane.received,
+        } if backplane else None,
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -357,39 +804,56 @@ def get_stats():
 
 @app.post("/api/user/init")
 def init_user(body: InitUserRequest):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM users WHERE uuid = %s", (body.uuid,))
-    user = cur.fetchone()
-    if not user:
-        default_name = f"grem-{body.uuid[:4]}"
-        cur.execute(
-            "INSERT INTO users (uuid, username, clicks, coins, inventory) VALUES (%s, %s, 0, 0, '[]') RETURNING *",
-            (body.uuid, default_name),
-        )
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM users WHERE uuid = %s", (body.uuid,))
         user = cur.fetchone()
-        conn.commit()
-    cur.close()
-    conn.close()
+        if not user:
+            # Usernames are unique: lengthen the uuid suffix until the default name is free
+            for suffix_len in (4, 6, 8, 10):
+                try:
+                    cur.execute(
+                        "INSERT INTO users (uuid, username, clicks, coins, inventory) VALUES (%s, %s, 0, 0, '[]') RETURNING *",
+                        (body.uuid, f"grem-{body.uuid[:suffix_len]}"),
+                    )
+                    user = cur.fetchone()
+                    break
+                except psycopg2.IntegrityError:
+                    conn.rollback()
+                    # Name taken, or a concurrent request already created this user
+                    cur.execute("SELECT * FROM users WHERE uuid = %s", (body.uuid,))
+                    user = cur.fetchone()
+                    if user is not None:
+                        break
+            if user is None:
+                raise HTTPException(status_code=409, detail="Could not pick a default username")
+            conn.commit()
+            leaderboard.set_clicks(user["uuid"], user["clicks"], user["username"])
+    click_aggregator.mark_known(body.uuid)
     return serialize_row(user)
 
 
+def save_username(user_uuid: str, username: str):
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE users SET username = %s WHERE uuid = %s", (username, user_uuid))
+        conn.commit()
+
+
 @app.post("/api/user/update-username")
-def update_username(body: UpdateUsernameRequest):
+async def update_username(body: UpdateUsernameRequest):
     new_username = body.username.strip()
     if not new_username or len(new_username) > 15:
         raise HTTPException(status_code=400, detail="Choose another name!")
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("UPDATE users SET username = %s WHERE uuid = %s", (new_username, body.uuid))
-        conn.commit()
-        return {"success": True, "username": new_username}
+        await db_pool.run(save_username, body.uuid, new_username)
     except psycopg2.IntegrityError:
         raise HTTPException(status_code=400, detail="Username already taken!")
-    finally:
-        cur.close()
-        conn.close()
+
+    # Leaderboard names live in memory on every worker
+    leaderboard.set_username(body.uuid, new_username)
+    broadcaster.mark_dirty()
+    if backplane:
+        await backplane.publish("username", uuid=body.uuid, username=new_username)
+    return {"success": True, "username": new_username}
 
 
 # ---------------------------------------------------------------------------
@@ -398,51 +862,11 @@ def update_username(body: UpdateUsernameRequest):
 
 @app.post("/api/clicker/increment")
 async def increment_bites(body: IncrementRequest):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT clicks, coins, gacha_pulls, inventory FROM users WHERE uuid = %s", (body.uuid,))
-    user = cur.fetchone()
-    if not user:
-        cur.close()
-        conn.close()
+    if not await click_aggregator.user_exists(body.uuid):
         raise HTTPException(status_code=404, detail="User not found")
 
-    old_clicks = user["clicks"]
-    new_clicks = old_clicks + body.amount
-    pulls_to_add = (new_clicks // 1000) - (old_clicks // 1000)
-
-    if pulls_to_add > 0:
-        cur.execute(
-            """
-            UPDATE users
-            SET clicks = %s, coins = coins + %s, gacha_pulls = gacha_pulls + %s
-            WHERE uuid = %s
-            RETURNING clicks, coins, gacha_pulls, inventory
-            """,
-            (new_clicks, body.amount, pulls_to_add, body.uuid),
-        )
-    else:
-        cur.execute(
-            """
-            UPDATE users
-            SET clicks = %s, coins = coins + %s
-            WHERE uuid = %s
-            RETURNING clicks, coins, gacha_pulls, inventory
-            """,
-            (new_clicks, body.amount, body.uuid),
-        )
-
-    cur.execute(
-        "UPDATE global_stats SET value = value + %s WHERE stat_name = 'total_clicks'",
-        (body.amount,),
-    )
-
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    # Broadcast global update AND push fresh personal stats to this user's stream
-    await broadcast_update(target_uuid=body.uuid)
+    # Buffered; the aggregator writes it with the next batch and then broadcasts
+    click_aggregator.add(body.uuid, body.amount)
 
     return {"ok": True}
 
@@ -454,40 +878,21 @@ async def stream(user_uuid: str):
       - total_clicks, leaderboard, active_players  (global — same for everyone)
       - user_clicks, user_coins, user_gacha_pulls, user_inventory  (personal)
     """
-    q: asyncio.Queue = asyncio.Queue()
-
-    # Register this queue under the user's uuid
-    if user_uuid not in subscribers:
-        subscribers[user_uuid] = []
-    subscribers[user_uuid].append(q)
-
-    # Send an immediate snapshot so the page doesn't wait for the first click
-    global_data = get_global_data()
-    user_data = get_user_data(user_uuid)
-    active_players = sum(len(qs) for qs in subscribers.values())
-    initial_payload = {**global_data, "active_players": active_players, **user_data}
-    await q.put(initial_payload)
-
-    # Also tell everyone else the active count just changed
-    await broadcast_update()
+    # Registers the queue and sends an immediate snapshot so the page doesn't wait for the first click
+    q = await broadcaster.subscribe(user_uuid)
 
     async def event_generator():
         try:
             while True:
                 try:
-                    data = await asyncio.wait_for(q.get(), timeout=20.0)
-                    yield f"data: {json.dumps(data)}\n\n"
+                    # Frames arrive pre-encoded and are shared between subscribers
+                    yield await asyncio.wait_for(q.get(), timeout=20.0)
                 except asyncio.TimeoutError:
                     # Keepalive comment — prevents proxies from closing the connection
-                    yield ": keepalive\n\n"
+                    yield b": keepalive\n\n"
         finally:
-            # Clean up this queue on disconnect
-            if user_uuid in subscribers:
-                subscribers[user_uuid].remove(q)
-                if not subscribers[user_uuid]:
-                    del subscribers[user_uuid]
-            # Notify everyone the active count dropped
-            asyncio.create_task(broadcast_update())
+            # Clean up this queue on disconnect; the next tick carries the new active count
+            broadcaster.unsubscribe(user_uuid, q)
 
     return StreamingResponse(
         event_generator(),
@@ -501,24 +906,15 @@ async def stream(user_uuid: str):
 
 @app.get("/api/clicker/stats")
 def get_clicker_stats():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT value FROM global_stats WHERE stat_name = 'total_clicks'")
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT value FROM global_stats WHERE stat_name = 'total_clicks'")
+        row = cur.fetchone()
     return {"total_clicks": row["value"] if row else 0}
 
 
 @app.get("/api/leaderboard")
 def get_leaderboard():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT username, clicks FROM users ORDER BY clicks DESC LIMIT 10")
-    leaders = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [dict(l) for l in leaders]
+    return leaderboard.top()
 
 
 # ---------------------------------------------------------------------------
@@ -527,30 +923,23 @@ def get_leaderboard():
 
 @app.post("/api/shop/buy")
 def buy_item(body: BuyItemRequest):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT coins, inventory FROM users WHERE uuid = %s", (body.uuid,))
-    user = cur.fetchone()
-    if not user:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="User not found")
-    if user["coins"] < body.price:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=400, detail="Not enough coins!")
-
-    current_inventory = list(user["inventory"]) if user["inventory"] else []
-    if body.id not in current_inventory:
-        current_inventory.append(body.id)
-
-    cur.execute(
-        "UPDATE users SET coins = coins - %s, inventory = %s WHERE uuid = %s",
-        (body.price, json.dumps(current_inventory), body.uuid),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT coins, inventory FROM users WHERE uuid = %s", (body.uuid,))
+        user = cur.fetchone()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        if user["coins"] < body.price:
+            raise HTTPException(status_code=400, detail="Not enough coins!")
+
+        current_inventory = list(user["inventory"]) if user["inventory"] else []
+        if body.id not in current_inventory:
+            current_inventory.append(body.id)
+
+        cur.execute(
+            "UPDATE users SET coins = coins - %s, inventory = %s WHERE uuid = %s",
+            (body.price, json.dumps(current_inventory), body.uuid),
+        )
+        conn.commit()
     return {"success": True, "inventory": current_inventory}
 
 
@@ -568,27 +957,22 @@ COSMETIC_POOL = [
 
 @app.post("/api/gacha/roll")
 def roll_gacha(body: GachaRollRequest):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT gacha_pulls, inventory FROM users WHERE uuid = %s", (body.uuid,))
-    user = cur.fetchone()
-    if not user or user["gacha_pulls"] < 1:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=400, detail="No pulls available!")
-
-    reward = random.choice(COSMETIC_POOL)
-    new_inventory = list(user["inventory"]) if user["inventory"] else []
-    if reward["id"] not in new_inventory:
-        new_inventory.append(reward["id"])
-
-    cur.execute(
-        "UPDATE users SET gacha_pulls = gacha_pulls - 1, inventory = %s WHERE uuid = %s",
-        (json.dumps(new_inventory), body.uuid),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT gacha_pulls, inventory FROM users WHERE uuid = %s", (body.uuid,))
+        user = cur.fetchone()
+        if not user or user["gacha_pulls"] < 1:
+            raise HTTPException(status_code=400, detail="No pulls available!")
+
+        reward = random.choice(COSMETIC_POOL)
+        new_inventory = list(user["inventory"]) if user["inventory"] else []
+        if reward["id"] not in new_inventory:
+            new_inventory.append(reward["id"])
+
+        cur.execute(
+            "UPDATE users SET gacha_pulls = gacha_pulls - 1, inventory = %s WHERE uuid = %s",
+            (json.dumps(new_inventory), body.uuid),
+        )
+        conn.commit()
     return {"success": True, "reward": reward}
 
 
@@ -598,4 +982,7 @@ def roll_gacha(body: GachaRollRequest):
 
 @sio.event
 async def send_message(sid, data):
-    await sio.emit("chat_message", data)
\ No newline at end of file
+    await sio.emit("chat_message", data)
+    # Relay to clients connected to the other workers
+    if backplane:
+        await backplane.publish("chat", data=data)
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+
+import psycopg2
+
+CHANNEL = "gigiquotes_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+
+class PgBackplane:
+    """
+    Cross-worker pub/sub over Postgres LISTEN/NOTIFY.
+
+    Every uvicorn worker holds one dedicated LISTEN connection and publishes
+    with pg_notify() through the shared pool. Messages are JSON objects with
+    a `type` and the sending `worker` id; each worker skips its own messages,
+    so publishers deliver locally first and the backplane only carries the
+    event to the other processes.
+
+    Presence is shared with heartbeats: each worker announces its local
+    subscriber count, and counts from workers that stop announcing expire.
+
+    To try it locally, point DATABASE_URL at a local Postgres and run
+    `uvicorn app:socket_app --workers 4` (or set WEB_CONCURRENCY). Socket.IO
+    clients must connect with `transports: ['websocket']` (ClickerPage does):
+    Engine.IO long-polling needs sticky routing to the worker that created the
+    session and fails with "Invalid session" behind plain round-robin.
+    """
+
+    def __init__(self, dsn, pool, channel=CHANNEL, heartbeat_s=5.0):
+        self.dsn = dsn
+        self.pool = pool
+        self.channel = channel
+        self.heartbeat_s = heartbeat_s
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self._handlers = {}
+        self._handler_tasks = set()     # the loop only holds tasks weakly
+        self._conn = None
+        self._loop = None
+        self._task = None
+        self._local_players = lambda: 0
+        self._presence_changed = None
+        self._remote_presence: dict[str, tuple[int, float]] = {}   # { worker_id: (count, seen_at) }
+        self.received = 0
+        self.published = 0
+
+    # ------------------------------------------------------------------
+    # Wiring
+    # ------------------------------------------------------------------
+
+    def on(self, message_type: str, handler):
+        """Register an async handler(message) for messages from other workers."""
+        self._handlers[message_type] = handler
+
+    def track_presence(self, local_players, on_change=None):
+        """
+        Announce `local_players()` to the other workers every heartbeat (and
+        as soon as it changes); `on_change()` runs when the cluster total moves.
+        """
+        self._local_players = local_players
+        self._presence_changed = on_change
+
+    def remote_players(self) -> int:
+        now = self._loop.time() if self._loop else 0.0
+        ttl = self.heartbeat_s * 3
+        return sum(count for count, seen in self._remote_presence.values() if now - seen < ttl)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self._listen()
+        self._task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.publish("presence", count=0)
+        except Exception:
+            pass
+        self._unlisten()
+
+    async def _listen(self):
+        self._conn = await self._loop.run_in_executor(None, self._open_listener)
+        self._loop.add_reader(self._conn.fileno(), self._on_readable)
+
+    def _open_listener(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _unlisten(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except (ValueError, OSError):
+            pass
+        try:
+            self._conn.close()
+        except psycopg2.Error:
+            pass
+        self._conn = None
+
+    # ------------------------------------------------------------------
+    # Publish
+    # ------------------------------------------------------------------
+
+    async def publish(self, message_type: str, **data):
+        payload = self._encode(message_type, data)
+        size = len(payload.encode())
+        if size > MAX_PAYLOAD_BYTES:
+            print(f"Backplane: dropping oversized {message_type} message ({size} bytes)")
+            return
+        await self.pool.run(self._notify, payload)
+        self.published += 1
+
+    async def publish_items(self, message_type: str, key: str, items):
+        """
+        Publish `items` under `key` in as many `message_type` messages as it
+        takes to keep each one under MAX_PAYLOAD_BYTES. Split on encoded size,
+        not item count: json.dumps escapes non-ASCII (a username emoji is 12
+        bytes), so a fixed count of items has no fixed size.
+        """
+        envelope = len(self._encode(message_type, {key: []}).encode())
+        batch, size = [], envelope
+        for item in items:
+            item_size = len(json.dumps(item, separators=(",", ":")).encode()) + 1   # + separating comma
+            if batch and size + item_size > MAX_PAYLOAD_BYTES:
+                await self.publish(message_type, **{key: batch})
+                batch, size = [], envelope
+            batch.append(item)
+            size += item_size
+        if batch:
+            await self.publish(message_type, **{key: batch})
+
+    def _encode(self, message_type: str, data: dict) -> str:
+        return json.dumps({"type": message_type, "worker": self.worker_id, **data}, separators=(",", ":"))
+
+    def _notify(self, payload: str):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            conn.commit()
+
+    # ------------------------------------------------------------------
+    # Receive
+    # ------------------------------------------------------------------
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            print(f"Backplane: listener connection lost: {e}")
+            self._unlisten()
+            return
+
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                message = json.loads(notify.payload)
+            except ValueError:
+                continue
+            if message.get("worker") == self.worker_id:
+                continue
+            self.received += 1
+            self._dispatch(message)
+
+    def _dispatch(self, message: dict):
+        message_type = message.get("type")
+        if message_type == "presence":
+            self._update_presence(message["worker"], int(message.get("count", 0)))
+            return
+        handler = self._handlers.get(message_type)
+        if handler is not None:
+            task = asyncio.create_task(handler(message))
+            self._handler_tasks.add(task)
+            task.add_done_callback(self._handler_tasks.discard)
+
+    def _update_presence(self, worker_id: str, count: int):
+        before = self.remote_players()
+        if count:
+            self._remote_presence[worker_id] = (count, self._loop.time())
+        else:
+            self._remote_presence.pop(worker_id, None)
+        if self.remote_players() != before and self._presence_changed:
+            self._presence_changed()
+
+    # ------------------------------------------------------------------
+    # Heartbeat — presence announcements + listener reconnects
+    # ------------------------------------------------------------------
+
+    async def _heartbeat(self):
+        last_sent, last_count = None, None
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                if self._conn is None:
+                    await self._listen()
+
+                now = self._loop.time()
+                count = self._local_players()
+                if count != last_count or last_sent is None or now - last_sent >= self.heartbeat_s:
+                    await self.publish("presence", count=count)
+                    last_sent, last_count = now, count
+
+                # Workers that stopped announcing (crashed, killed) drop out of the total
+                expired = [w for w, (_, seen) in self._remote_presence.items() if now - seen >= self.heartbeat_s * 3]
+                for worker_id in expired:
+                    del self._remote_presence[worker_id]
+                if expired and self._presence_changed:
+                    self._presence_changed()
+            except Exception as e:
+                print(f"Backplane heartbeat failed: {e}")
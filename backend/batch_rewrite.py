@@ -0,0 +1,173 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from psycopg2.extras import execute_values
+
+import database as db
+import keywords
+from data_version import bump_data_version
+from export_static import export_changed
+
+DEFAULT_BATCH_SIZE = 5000    # rows per commit
+DEFAULT_CHUNK_SIZE = 500     # rows per unit of work handed to a worker
+
+
+def load_checkpoint(cur, job: str):
+    cur.execute("SELECT last_id FROM job_checkpoints WHERE job = %s", (job,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def save_checkpoint(cur, job: str, last_id: int):
+    cur.execute(
+        """
+        INSERT INTO job_checkpoints (job, last_id) VALUES (%s, %s)
+        ON CONFLICT (job) DO UPDATE SET last_id = EXCLUDED.last_id, updated_at = NOW()
+        """,
+        (job, last_id),
+    )
+
+
+def clear_checkpoint(cur, job: str):
+    cur.execute("DELETE FROM job_checkpoints WHERE job = %s", (job,))
+
+
+def rewrite_quotes(job: str, transform, batch_size=DEFAULT_BATCH_SIZE, resume=True, vod_id=None,
+                   workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream every quote (or one VOD's quotes) through `transform` and write
+    back the ones it changed.
+
+    `transform(rows)` gets a list of (id, vod_id, content) tuples and returns
+    [(id, vod_id, new_content), ...] for the rows that changed. With
+    `workers > 1` it runs in a process pool, so it must be picklable (a
+    module-level function or a method of a picklable object).
+
+    Quotes are read in id order through a server-side (named) cursor on a
+    read-only connection, `chunk_size` rows at a time, so memory stays flat
+    whatever the corpus size. At most `2 * workers` chunks are in flight.
+    Results are consumed in submission order by this process, the single
+    writer, which applies them with one set-based UPDATE per `batch_size`
+    rows and commits that together with the keyword rollup, the data version
+    and a checkpoint of the last id covered. An interrupted run picks up
+    after that id when started again with `resume=True`.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    read_conn = db.connect()
+    write_conn = db.connect()
+    if read_conn is None or write_conn is None:
+        return 0
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    in_flight = deque()                  # (last id in chunk, rows in chunk, Future)
+    pending_changes, pending_rows = [], 0
+    total_seen = total_updated = 0
+    changed_vods = set()
+    started = time.monotonic()
+
+    def submit(rows):
+        if executor is not None:
+            future = executor.submit(transform, rows)
+        else:
+            future = Future()
+            future.set_result(transform(rows))
+        in_flight.append((rows[-1][0], len(rows), future))
+
+    def commit_pending(last_id):
+        nonlocal pending_changes, pending_rows, total_seen, total_updated
+        changed_vods.update(_write_batch(write_conn, job, last_id, pending_changes))
+        total_seen += pending_rows
+        total_updated += len(pending_changes)
+        pending_changes, pending_rows = [], 0
+        rate = total_seen / max(time.monotonic() - started, 1e-6)
+        print(f"[{job}] {total_seen} quotes scanned, {total_updated} updated "
+              f"({rate:.0f} rows/s, {rate / workers:.0f} per worker, {workers} worker(s))")
+
+    def collect_one():
+        nonlocal pending_rows
+        last_id, n_rows, future = in_flight.popleft()
+        pending_changes.extend(future.result())
+        pending_rows += n_rows
+        if pending_rows >= batch_size:
+            commit_pending(last_id)
+        return last_id
+
+    try:
+        with write_conn.cursor() as cur:
+            start_after = load_checkpoint(cur, job) if resume else None
+            if start_after is None:
+                clear_checkpoint(cur, job)
+        write_conn.commit()
+        if start_after is not None:
+            print(f"[{job}] Resuming after quote id {start_after}.")
+
+        conditions, params = ["content IS NOT NULL", "content != ''"], []
+        if start_after is not None:
+            conditions.append("id > %s")
+            params.append(start_after)
+        if vod_id is not None:
+            conditions.append("vod_id = %s")
+            params.append(vod_id)
+
+        last_id = None
+        read_conn.set_session(readonly=True)
+        with read_conn.cursor(name=f"{job}_reader".replace(":", "_")) as reader:
+            reader.itersize = chunk_size
+            reader.execute(
+                f"SELECT id, vod_id, content FROM quotes WHERE {' AND '.join(conditions)} ORDER BY id",
+                params,
+            )
+            while True:
+                rows = reader.fetchmany(chunk_size)
+                if not rows:
+                    break
+                submit(rows)
+                while len(in_flight) >= workers * 2:
+                    last_id = collect_one()
+            while in_flight:
+                last_id = collect_one()
+        if pending_rows:
+            commit_pending(last_id)
+
+        with write_conn.cursor() as cur:
+            clear_checkpoint(cur, job)
+        write_conn.commit()
+        print(f"[{job}] Done. Updated {total_updated} of {total_seen} quotes in {len(changed_vods)} VODs.")
+
+    except Exception as e:
+        write_conn.rollback()
+        print(f"[{job}] Stopped after {total_seen} quotes: {e}. Re-run to resume from the checkpoint.")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # Batches committed before a failure still need their exports refreshed
+        if changed_vods:
+            export_changed(write_conn, changed_vods)
+        read_conn.close()
+        write_conn.close()
+    return total_updated
+
+
+def _write_batch(conn, job, last_id, changes) -> set:
+    vod_ids = {vod_id for _, vod_id, _ in changes}
+    with conn.cursor() as cur:
+        if changes:
+            # content_tsv follows through the quotes trigger
+            execute_values(
+                cur,
+                """
+                UPDATE quotes AS q SET content = d.content
+                FROM (VALUES %s) AS d(id, content)
+                WHERE q.id = d.id
+                """,
+                [(quote_id, content) for quote_id, _, content in changes],
+                template="(%s::int, %s::text)",
+                page_size=len(changes),
+            )
+            keywords.refresh_keyword_stats(cur, vod_ids)
+            bump_data_version(cur)
+        save_checkpoint(cur, job, last_id)
+    conn.commit()
+    return vod_ids
@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+
+def encode_event(payload: dict) -> bytes:
+    """Serialize one SSE `data:` frame."""
+    return b"data: " + json.dumps(payload, separators=(",", ":")).encode() + b"\n\n"
+
+
+class Broadcaster:
+    """
+    Coalescing SSE fan-out.
+
+    Callers only mark state as dirty; a background task turns everything that
+    changed since the last tick into at most one frame per subscriber, and
+    never runs more than `max_rate_hz` ticks per second. Per tick:
+
+    - global state is fetched once and encoded once, and the same bytes are
+      queued for every subscriber
+    - personal stats are fetched in one query for the dirty users only, and
+      those users get a frame with their fields merged in instead
+    - queues are bounded; when a slow consumer's queue is full the oldest
+      frame is dropped, since every frame is a full snapshot anyway
+    """
+
+    def __init__(self, pool, fetch_global, fetch_users, max_rate_hz=10, queue_size=8, remote_players=None):
+        self.pool = pool
+        self.fetch_global = fetch_global    # () -> dict
+        self.fetch_users = fetch_users      # (list[uuid]) -> {uuid: dict}
+        self.remote_players = remote_players or (lambda: 0)   # streams held by other workers
+        self.min_interval = 1 / max_rate_hz
+        self.queue_size = queue_size
+
+        # { user_uuid: [queue, queue, ...] }  (same user on multiple tabs → multiple queues)
+        self.subscribers: dict[str, list[asyncio.Queue]] = {}
+        self._dirty_users: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.dropped_frames = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+
+    @property
+    def local_players(self) -> int:
+        return sum(len(qs) for qs in self.subscribers.values())
+
+    @property
+    def active_players(self) -> int:
+        return self.local_players + self.remote_players()
+
+    async def subscribe(self, user_uuid: str) -> asyncio.Queue:
+        """Register a stream and queue an immediate snapshot for it."""
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Registered first so the snapshot's active count includes this stream
+        self.subscribers.setdefault(user_uuid, []).append(q)
+        try:
+            global_data = await self.pool.run(self.fetch_global)
+            users = await self.pool.run(self.fetch_users, [user_uuid])
+        except BaseException:
+            # PoolTimeout, a DB error or the client going away: don't leak the queue
+            self.unsubscribe(user_uuid, q)
+            raise
+        payload = {**global_data, "active_players": self.active_players, **users.get(user_uuid, {})}
+        self._offer(q, encode_event(payload))
+
+        # Everyone else needs the new active count
+        self.mark_dirty()
+        return q
+
+    def unsubscribe(self, user_uuid: str, q: asyncio.Queue):
+        queues = self.subscribers.get(user_uuid)
+        if queues and q in queues:
+            queues.remove(q)
+            if not queues:
+                del self.subscribers[user_uuid]
+        self.mark_dirty()
+
+    def mark_dirty(self, user_uuids=()):
+        """Schedule a global refresh, plus personal refreshes for `user_uuids`."""
+        self._dirty_users.update(user_uuids)
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Tick loop
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            started = loop.time()
+            try:
+                await self._tick()
+            except Exception as e:
+                print(f"SSE broadcast failed: {e}")
+            # Everything marked dirty while we slept is coalesced into the next tick
+            await asyncio.sleep(max(0.0, self.min_interval - (loop.time() - started)))
+
+    async def _tick(self):
+        self._wakeup.clear()
+        dirty_users = self._dirty_users & self.subscribers.keys()
+        self._dirty_users = set()
+        if not self.subscribers:
+            return
+
+        global_data = await self.pool.run(self.fetch_global)
+        user_data = await self.pool.run(self.fetch_users, list(dirty_users)) if dirty_users else {}
+
+        global_payload = {**global_data, "active_players": self.active_players}
+        shared_frame = encode_event(global_payload)
+
+        for user_uuid, queues in list(self.subscribers.items()):
+            if user_uuid in user_data:
+                frame = encode_event({**global_payload, **user_data[user_uuid]})
+            else:
+                frame = shared_frame
+            for q in list(queues):
+                self._offer(q, frame)
+
+    def _offer(self, q: asyncio.Queue, frame: bytes):
+        if q.full():
+            try:
+                q.get_nowait()
+                self.dropped_frames += 1
+            except asyncio.QueueEmpty:
+                pass
+        q.put_nowait(frame)
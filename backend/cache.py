@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from data_version import read_data_version
+
+
+class ResponseCache:
+    """
+    In-process LRU + TTL cache for read-only endpoints.
+
+    Keys are (namespace, data version, normalized params). Transcript data only
+    changes when the ingest/post-processing scripts run, and those bump the
+    `data_version` row; when the version moves every cached entry is dropped.
+    The version arrives over the backplane (NOTIFY) and is also polled every
+    `version_poll_s` as a fallback.
+
+    Concurrent misses for the same key are single-flighted: one caller runs the
+    query and the others wait for its result.
+
+    Besides `max_entries`, the cache is bounded by `max_bytes`: values that
+    expose `nbytes` (EncodedPayload, several MB for a long transcript) count
+    against it, small JSON-able results count as zero.
+    """
+
+    def __init__(self, pool, max_entries=1024, ttl_s=300, version_poll_s=30, max_bytes=256 * 1024 * 1024):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.version_poll_s = version_poll_s
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()     # { key: (value, expires_at, nbytes) }
+        self._bytes = 0
+        self._inflight: dict = {}                      # { key: Future }
+        self._version = None
+        self._listeners = []
+        self._task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        await self._poll_version()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.version_poll_s)
+            try:
+                await self._poll_version()
+            except Exception as e:
+                print(f"Data version poll failed: {e}")
+
+    async def _poll_version(self):
+        self.set_version(await self.pool.run(self._fetch_version))
+
+    def _fetch_version(self) -> int:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            return read_data_version(cur)
+
+    # ------------------------------------------------------------------
+    # Versioning
+    # ------------------------------------------------------------------
+
+    def on_invalidate(self, callback):
+        """Run `callback()` whenever the data version changes."""
+        self._listeners.append(callback)
+
+    def set_version(self, version: int):
+        with self._lock:
+            if version == self._version:
+                return
+            first = self._version is None
+            self._version = version
+            self._entries.clear()
+            self._bytes = 0
+        if not first:
+            for callback in self._listeners:
+                callback()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get_or_compute(self, namespace: str, params: dict, compute, ttl_s=None):
+        """Return the cached value for (namespace, params), computing it on a miss."""
+        with self._lock:
+            version = self._version
+            key = (namespace, version, tuple(sorted(params.items())))
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            with self._lock:
+                # Don't store a result computed against data that has since changed
+                if version == self._version:
+                    nbytes = getattr(value, "nbytes", 0)
+                    previous = self._entries.pop(key, None)
+                    if previous is not None:
+                        self._bytes -= previous[2]
+                    self._entries[key] = (value, time.monotonic() + (ttl_s or self.ttl_s), nbytes)
+                    self._bytes += nbytes
+                    # Never evict the entry just stored, even if it alone is over budget
+                    while len(self._entries) > 1 and (
+                        len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+                    ):
+                        _, evicted = self._entries.popitem(last=False)
+                        self._bytes -= evicted[2]
+                        self.evictions += 1
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "data_version": self._version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,132 @@
+import asyncio
+
+from psycopg2.extras import execute_values
+
+# A free gacha pull is awarded every time a user's click count crosses a multiple of this
+CLICKS_PER_PULL = 1000
+
+
+class ClickAggregator:
+    """
+    Write-behind buffer for clicker increments.
+
+    Clicks are summed per user in memory and written every `flush_interval_ms`
+    in one transaction: one UPDATE for all users in the batch and one UPDATE of
+    the hot `global_stats` row. Gacha pulls are derived in SQL from the old and
+    new click totals, so crossing a 1000-click threshold is counted exactly
+    once no matter how increments were grouped into batches.
+
+    All methods except `_write_batch` must be called from the event loop.
+    """
+
+    def __init__(self, pool, flush_interval_ms=250, on_flush=None):
+        self.pool = pool
+        self.flush_interval = flush_interval_ms / 1000
+        self.on_flush = on_flush          # async callback([(uuid, username, clicks)]) after each flush
+        self._pending: dict[str, int] = {}
+        self._known_users: set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Click flush failed, will retry: {e}")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def user_exists(self, user_uuid: str) -> bool:
+        if user_uuid in self._known_users:
+            return True
+        exists = await self.pool.run(self._lookup_user, user_uuid)
+        if exists:
+            self._known_users.add(user_uuid)
+        return exists
+
+    def mark_known(self, user_uuid: str):
+        self._known_users.add(user_uuid)
+
+    def add(self, user_uuid: str, amount: int):
+        self._pending[user_uuid] = self._pending.get(user_uuid, 0) + amount
+
+    async def flush(self) -> list[tuple]:
+        async with self._flush_lock:
+            if not self._pending:
+                return []
+            batch, self._pending = self._pending, {}
+            try:
+                updated = await self.pool.run(self._write_batch, batch)
+            except Exception:
+                # Put the deltas back so the next flush retries them
+                for user_uuid, amount in batch.items():
+                    self.add(user_uuid, amount)
+                raise
+
+        if self.on_flush and updated:
+            await self.on_flush(updated)
+        return updated
+
+    # ------------------------------------------------------------------
+    # DB work (runs on the pool executor)
+    # ------------------------------------------------------------------
+
+    def _lookup_user(self, user_uuid: str) -> bool:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM users WHERE uuid = %s", (user_uuid,))
+            return cur.fetchone() is not None
+
+    def _write_batch(self, batch: dict[str, int]) -> list[tuple]:
+        uuids = sorted(batch)
+        total = sum(batch.values())
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            # Lock rows in a fixed order so concurrent flushers can't deadlock
+            cur.execute(
+                "SELECT 1 FROM users WHERE uuid = ANY(%s) ORDER BY uuid FOR UPDATE",
+                (uuids,),
+            )
+            updated = execute_values(
+                cur,
+                f"""
+                UPDATE users AS u
+                SET clicks = u.clicks + d.delta,
+                    coins = u.coins + d.delta,
+                    gacha_pulls = u.gacha_pulls
+                        + ((u.clicks + d.delta) / {CLICKS_PER_PULL} - u.clicks / {CLICKS_PER_PULL})
+                FROM (VALUES %s) AS d(uuid, delta)
+                WHERE u.uuid = d.uuid
+                RETURNING u.uuid, u.username, u.clicks
+                """,
+                [(u, batch[u]) for u in uuids],
+                template="(%s, %s::int)",
+                fetch=True,
+            )
+            cur.execute(
+                "UPDATE global_stats SET value = value + %s WHERE stat_name = 'total_clicks'",
+                (total,),
+            )
+            conn.commit()
+        return [tuple(row) for row in updated]
@@ -0,0 +1,144 @@
+import os
+import re
+import sys
+
+# ---------------------------------------------------------------------------
+# ASR correction dictionary
+#
+# Whisper's recurring misspellings of names and in-jokes, as
+# (heard, replacement) rules. Bump CORRECTIONS_VERSION whenever the list
+# changes: the batch job checkpoints under the version, so a new version
+# re-scans every quote while an interrupted run of the same version resumes.
+#
+# All rules are compiled into one alternation, longest pattern first, and
+# applied in a single left-to-right pass per text. Matches are whole words
+# only ("cc" no longer rewrites "accent") and case-insensitive; the
+# replacement follows the match's case (see _match_case). Rules don't chain:
+# each span of the original text is rewritten at most once, so a rule has to
+# name its final spelling ("jiji tomo" -> "Gigi-Tomo", not via "Gigi tomo").
+# ---------------------------------------------------------------------------
+CORRECTIONS_VERSION = 1
+
+CORRECTIONS = [
+    ("yowie", "yaoi"),
+    ("yowi", "yaoi"),
+    ("So see the immigrants", "Cecilia Immergreen"),
+    ("more coliope", "Mori Calliope"),
+    ("league of legends", "League of Legends"),
+    ("callie", "Calli"),
+    ("muddin", "Murin"),
+    ("jiji", "Gigi"),
+    ("jiji tomo", "Gigi-Tomo"),
+    ("Gigi tomo", "Gigi-Tomo"),
+    ("immigreen", "Immergreen"),
+    ("mcgrew", "Immergreen"),
+    ("ebbinggwee", "Immergreen"),
+    ("emmergreen", "Immergreen"),
+    ("emmergree", "Immergreen"),
+    ("ceci", "Cece"),
+    ("seci", "Cece"),
+    ("cc", "Cece"),
+    ("cici", "Cece"),
+    ("grams", "grems"),
+    ("gram", "grem"),
+    ("Oral Crony", "Ouro Kronii"),
+    ("jimoonie", "Gimurin"),
+    ("jimunin", "Gimurin"),
+]
+
+# Processes for the batch job; 0 means one per CPU core
+CORRECTION_WORKERS = int(os.getenv("CORRECTION_WORKERS", "1"))
+
+
+# Shouted matches this short are usually how Whisper writes a name ("CC"), not emphasis
+ACRONYM_MAX_LEN = 4
+
+
+def _match_case(matched: str, replacement: str) -> str:
+    """
+    Proper-noun replacements (any capital letter) keep their canonical casing.
+    Otherwise a SHOUTED match longer than an acronym stays shouted, and a
+    Capitalized match capitalizes the replacement.
+    """
+    if not replacement.islower():
+        return replacement
+    if matched.isupper() and len(matched) > ACRONYM_MAX_LEN:
+        return replacement.upper()
+    if matched[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+def _normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+class CorrectionDictionary:
+    def __init__(self, rules):
+        self.replacements = {}
+        for heard, replacement in rules:
+            self.replacements[_normalize(heard)] = replacement
+
+        # Longest first so "jiji tomo" wins over "jiji" and "emmergreen" over "emmergree";
+        # words inside a pattern match across any run of whitespace. Each rule is its
+        # own named group and the match is resolved through match.lastgroup: case-folding
+        # the matched text instead can disagree with IGNORECASE ("ſeci", "jİji").
+        self.by_group = {}
+        alternatives = []
+        for index, heard in enumerate(sorted(self.replacements, key=len, reverse=True)):
+            group = f"r{index}"
+            self.by_group[group] = self.replacements[heard]
+            words = r"\s+".join(re.escape(word) for word in heard.split())
+            alternatives.append(f"(?P<{group}>{words})")
+        self.pattern = re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w)", re.IGNORECASE)
+
+    def _replace(self, match) -> str:
+        return _match_case(match.group(0), self.by_group[match.lastgroup])
+
+    def apply(self, text: str) -> str:
+        if not text:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def correct_rows(self, rows):
+        """(id, vod_id, content) rows -> [(id, vod_id, corrected)] for rows that changed."""
+        changes = []
+        for quote_id, vod_id, content in rows:
+            corrected = self.apply(content)
+            if corrected != content:
+                changes.append((quote_id, vod_id, corrected))
+        return changes
+
+
+DICTIONARY = CorrectionDictionary(CORRECTIONS)
+
+
+def apply_corrections(text: str) -> str:
+    return DICTIONARY.apply(text)
+
+
+def apply_corrections_in_db(batch_size=None, resume=True, workers=CORRECTION_WORKERS, vod_id=None):
+    """Run the dictionary over existing quotes, rewriting only the rows it changes."""
+    import batch_rewrite
+
+    job = f"corrections_v{CORRECTIONS_VERSION}" + (f":{vod_id}" if vod_id else "")
+    return batch_rewrite.rewrite_quotes(
+        job,
+        DICTIONARY.correct_rows,
+        batch_size=batch_size or batch_rewrite.DEFAULT_BATCH_SIZE,
+        resume=resume,
+        vod_id=vod_id,
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    # python corrections.py apply [vod_id]     rewrite stored quotes
+    # python corrections.py "some text"        preview on a string
+    if sys.argv[1:2] == ["apply"]:
+        apply_corrections_in_db(vod_id=sys.argv[2] if len(sys.argv) > 2 else None)
+    elif sys.argv[1:]:
+        print(apply_corrections(" ".join(sys.argv[1:])))
+    else:
+        print('Usage: python corrections.py apply [vod_id] | python corrections.py "text"')
+        sys.exit(1)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+
+
+class SearchCountCache:
+    """
+    Exact match counts for popular searches, refreshed in the background.
+
+    Broad searches ("grem") match a large part of the corpus, so counting them
+    exactly on every page load scans most of the GIN posting list. Requests
+    record which searches are popular; every `refresh_interval_s` the
+    `refresh_top` most-requested ones are counted exactly off the request
+    path, and requests read the cached value instead of counting. Popularity is
+    recorded before the response cache, so cached hits count as demand too.
+    """
+
+    def __init__(self, pool, count_fn, refresh_interval_s=300, refresh_top=50, max_entries=5000):
+        self.pool = pool
+        self.count_fn = count_fn            # (key) -> exact count, runs on the pool executor
+        self.refresh_interval_s = refresh_interval_s
+        self.refresh_top = refresh_top
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._counts: dict[tuple, tuple[int, float]] = {}    # { key: (count, counted_at) }
+        self._popularity = Counter()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, key: tuple):
+        """Note that `key` was asked for; call on every request, cached response or not."""
+        with self._lock:
+            self._popularity[key] += 1
+
+    def get(self, key: tuple) -> int | None:
+        """Cached exact count, or None."""
+        with self._lock:
+            entry = self._counts.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.refresh_interval_s * 2:
+            return None
+        return entry[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached_counts": len(self._counts), "tracked_searches": len(self._popularity)}
+
+    def invalidate(self):
+        with self._lock:
+            self._counts.clear()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval_s)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Search count refresh failed: {e}")
+
+    async def refresh(self):
+        with self._lock:
+            popular = [key for key, _ in self._popularity.most_common(self.refresh_top)]
+            # Decay so yesterday's trending search eventually stops being refreshed
+            self._popularity = Counter({key: hits // 2 for key, hits in self._popularity.items() if hits > 1})
+        for key in popular:
+            count = await self.pool.run(self.count_fn, key)
+            with self._lock:
+                self._counts[key] = (count, time.monotonic())
+                if len(self._counts) > self.max_entries:
+                    oldest = min(self._counts, key=lambda k: self._counts[k][1])
+                    del self._counts[oldest]
+
+
+def estimate_rows(cur, sql: str, params) -> int:
+    """Row estimate for `sql` from the planner's statistics, without running it."""
+    cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    row = cur.fetchone()
+    plan = next(iter(row.values())) if isinstance(row, dict) else row[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,33 @@
+import json
+
+import psycopg2
+
+from backplane import CHANNEL
+
+
+def bump_data_version(cur) -> int:
+    """
+    Mark the transcript data as changed. Call inside the transaction that
+    changes quotes or the video catalog: API workers drop their cached
+    responses when it commits (NOTIFY is delivered on commit).
+    """
+    cur.execute("""
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = data_version.version + 1
+        RETURNING version
+    """)
+    version = cur.fetchone()[0]
+    payload = json.dumps({"type": "data_version", "worker": "ingest", "version": version})
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+    return version
+
+
+def read_data_version(cur) -> int:
+    try:
+        cur.execute("SELECT version FROM data_version WHERE id = 1")
+    except psycopg2.errors.UndefinedTable:
+        # Nothing has been ingested since the table was introduced
+        cur.connection.rollback()
+        return 0
+    row = cur.fetchone()
+    return row[0] if row else 0
@@ -4,6 +4,10 @@ import numpy as np
 from psycopg2.extensions import register_adapter, AsIs
 import os
 from dotenv import load_dotenv
+import keywords
+import migrations
+from data_version import bump_data_version
+from export_static import export_changed
 
 load_dotenv()
 
@@ -17,12 +21,19 @@ def adapt_numpy_int64(numpy_int64):
 register_adapter(np.float64, adapt_numpy_float64)
 register_adapter(np.int64, adapt_numpy_int64)
 
+_schema_checked = False
+
 def connect():
     """Establish and return a connection to the database."""
+    global _schema_checked
     print("Connecting to database...")
     try:
         conn = psycopg2.connect(os.getenv('DATABASE_URL'))
         print("CONNECTION SUCCESSFUL")
+        # Scripts may run before the API has ever started; bring the schema up once per process
+        if not _schema_checked:
+            migrations.migrate(conn)
+            _schema_checked = True
         return conn
     except Exception as e:
         print(f"Error connecting to database: {e}")
@@ -43,44 +54,29 @@ def save_vod_metadata(video_list):
     print(f"Saving {len(video_list)} videos to the database...")
    
     try:
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS video_catalog (
-            vod_id TEXT PRIMARY KEY,
-            title TEXT,
-            thumbnail TEXT,
-            upload_date DATE,
-            title_tsv tsvector  -- Added column
-        );
-        """
-        cur.execute(create_table_query)
-        conn.commit()
-        
-        # We use to_tsvector('english', title) to populate the tsv column
-        query = """
-            INSERT INTO video_catalog (vod_id, title, thumbnail, upload_date, title_tsv) 
-            VALUES (%s, %s, %s, %s, to_tsvector('english', %s)) 
-            ON CONFLICT (vod_id) DO UPDATE SET 
+        # title_tsv is filled by the video_catalog trigger (see textsearch.py).
+        # Rows whose metadata is unchanged are left alone and not returned,
+        # so a no-op sync neither invalidates caches nor re-exports anything.
+        changed = execute_values(cur,
+            """
+            INSERT INTO video_catalog (vod_id, title, thumbnail, upload_date) VALUES %s
+            ON CONFLICT (vod_id) DO UPDATE SET
                 title = EXCLUDED.title,
                 thumbnail = EXCLUDED.thumbnail,
-                upload_date = EXCLUDED.upload_date,
-                title_tsv = to_tsvector('english', EXCLUDED.title)
-        """
-        
-        # Note: We duplicate the title in the tuple so it fills both the 'title' and 'title_tsv' placeholders
-        data = [
-            (v['id'], v['title'], v['thumbnail'], v['upload_date'], v['title']) 
-            for v in video_list
-        ]
-
-        # execute_values needs a slightly different approach for functional calls like to_tsvector
-        # Alternatively, use a template in execute_values:
-        execute_values(cur, 
-            "INSERT INTO video_catalog (vod_id, title, thumbnail, upload_date, title_tsv) VALUES %s " +
-            "ON CONFLICT (vod_id) DO UPDATE SET title_tsv = to_tsvector('english', EXCLUDED.title)", 
-            [(v['id'], v['title'], v['thumbnail'], v['upload_date'], v['title']) for v in video_list],
-            template="(%s, %s, %s, %s, to_tsvector('english', %s))"
+                upload_date = EXCLUDED.upload_date
+            WHERE (video_catalog.title, video_catalog.thumbnail, video_catalog.upload_date)
+                IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.thumbnail, EXCLUDED.upload_date)
+            RETURNING vod_id
+            """,
+            [(v['id'], v['title'], v['thumbnail'], v['upload_date']) for v in video_list],
+            fetch=True,
         )
+        changed_ids = [row[0] for row in changed]
+        if changed_ids:
+            bump_data_version(cur)
         conn.commit()
+        print(f"{len(changed_ids)} new or changed video(s).")
+        export_changed(conn, changed_ids)
         
     except Exception as e:
         conn.rollback()
@@ -89,47 +85,123 @@ def save_vod_metadata(video_list):
         cur.close()
         conn.close()
 
+class _CopyStream:
+    """
+    File-like object that renders rows in COPY text format on demand, so
+    copy_expert streams them to the server without building one big buffer.
+    """
+
+    _ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+    def __init__(self, rows):
+        self._lines = (self._format(row) for row in rows)
+        self._buffer = ""
+
+    @classmethod
+    def _format(cls, row):
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append("\\N")
+            elif isinstance(value, (float, np.floating)):
+                fields.append(repr(float(value)))
+            else:
+                fields.append(str(value).translate(cls._ESCAPES))
+        return "\t".join(fields) + "\n"
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def copy_transcriptions(cur, transcripts):
+    """
+    Replace the quotes of every VOD in `transcripts` ({vod_id: quotes_list})
+    inside the caller's transaction.
+
+    Rows are streamed with COPY into a transaction-local staging table, then
+    swapped in with one set-based DELETE + INSERT ... SELECT; the quotes
+    trigger fills content_tsv server-side. Readers see either the old or the
+    new transcript, never a mix, and re-ingesting a VOD replaces it instead
+    of appending duplicates.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE quotes_staging (
+            vod_id TEXT,
+            start_time FLOAT8,
+            end_time FLOAT8,
+            content TEXT
+        ) ON COMMIT DROP
+    """)
+    # Quotes arrive already cleaned (see ingest_pipeline.py)
+    rows = (
+        (vod_id, q['start'], q['end'], q['text'])
+        for vod_id, quotes_list in transcripts.items()
+        for q in quotes_list
+    )
+    cur.copy_expert(
+        "COPY quotes_staging (vod_id, start_time, end_time, content) FROM STDIN",
+        _CopyStream(rows),
+    )
+
+    vod_ids = sorted(transcripts)
+    cur.execute("DELETE FROM quotes WHERE vod_id = ANY(%s)", (vod_ids,))
+    cur.execute("""
+        INSERT INTO quotes (vod_id, start_time, end_time, content)
+        SELECT vod_id, start_time, end_time, content
+        FROM quotes_staging
+        ORDER BY vod_id, start_time
+    """)
+    inserted = cur.rowcount
+    cur.execute("DROP TABLE quotes_staging")
+
+    # Keep the /api/stats rollup in step with the new rows
+    keywords.refresh_keyword_stats(cur, vod_ids)
+    bump_data_version(cur)
+    return inserted
+
+
 def save_transcriptions(quotes_list, vod_id):
     """
     Accepts a list of dicts and a VOD ID string.
-    Inserts everything into the database in one bulk operation.
+    Replaces the VOD's quotes in one bulk COPY operation.
     """
     if not quotes_list:
         print("No quotes to save.")
-        return
+        return 0
+
+    return save_transcriptions_bulk({vod_id: quotes_list})
+
+
+def save_transcriptions_bulk(transcripts):
+    """
+    Accepts {vod_id: quotes_list} and replaces all of them in a single
+    transaction. Meant for backfills: one COPY covers every VOD.
+    Returns the number of quotes saved, or None if the transaction failed.
+    """
+    transcripts = {vod_id: quotes for vod_id, quotes in transcripts.items() if quotes}
+    if not transcripts:
+        print("No quotes to save.")
+        return 0
 
     conn = connect()
     cur = conn.cursor()
-    
+
     try:
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS quotes (
-            id SERIAL PRIMARY KEY,
-            vod_id TEXT,
-            start_time FLOAT8,
-            end_time FLOAT8,
-            content TEXT,
-            content_tsv tsvector  -- Added column
-        );
-        """
-        cur.execute(create_table_query)
-        conn.commit()
-        
-        # Prepare data: (vod_id, start, end, content, content_again_for_tsv)
-        data = [(vod_id, q['start'], q['end'], q['text'], q['text']) for q in quotes_list]
-
-        # Use the template argument to wrap the last %s in to_tsvector()
-        insert_query = """
-            INSERT INTO quotes (vod_id, start_time, end_time, content, content_tsv) 
-            VALUES %s
-        """
-        execute_values(
-            cur, 
-            insert_query, 
-            data, 
-            template="(%s, %s, %s, %s, to_tsvector('english', %s))"
-        )
+        inserted = copy_transcriptions(cur, transcripts)
         conn.commit()
+        print(f"Saved {inserted} quotes for {len(transcripts)} VOD(s).")
+        export_changed(conn, list(transcripts))
+        return inserted
 
     except Exception as e:
         conn.rollback()
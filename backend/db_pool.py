@@ -0,0 +1,318 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    - at most `maxconn` connections are open at once; callers beyond that wait
+      up to `timeout` seconds for one to be returned
+    - connections idle for longer than `health_check_after` seconds are pinged
+      with SELECT 1 on checkout and transparently replaced if they are dead
+    - `stats()` reports in-use / idle / waiting counts and wait times
+    - `run()` executes blocking DB work from a coroutine on a dedicated
+      executor sized to `maxconn`, so the event loop never waits on I/O
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, health_check_after=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = []            # [(conn, returned_at), ...] — LIFO so hot connections stay hot
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = True
+        self._executor = None
+
+        # Monitoring counters
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._replaced = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def open(self):
+        with self._cond:
+            if not self._closed:
+                return
+            self._closed = False
+            self._executor = ThreadPoolExecutor(max_workers=self.maxconn, thread_name_prefix="db")
+        for _ in range(self.minconn):
+            conn = self._connect()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            executor, self._executor = self._executor, None
+            self._cond.notify_all()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.maxconn:
+                    conn, returned_at = None, None
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout:.1f}s")
+                waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+
+        # Connecting and pinging happen outside the lock
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, returned_at):
+                self._discard(conn)
+                with self._cond:
+                    self._replaced += 1
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with a half-finished transaction
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        else:
+            discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                to_close = conn
+            else:
+                self._idle.append((conn, time.monotonic()))
+                to_close = None
+            self._cond.notify()
+
+        if to_close is not None:
+            self._discard(to_close)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out for the duration of a `with` block.
+        Uncommitted work is rolled back when the block exits.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Await `fn(*args, **kwargs)` on the pool's DB executor.
+        The executor has one thread per connection, so coroutines queue here
+        instead of piling up threads that would only block on getconn().
+        """
+        if self._executor is None:
+            raise PoolTimeout("Connection pool is closed")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 2),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 2),
+                "timeouts": self._timeouts,
+                "replaced_connections": self._replaced,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn)
+
+    def _is_healthy(self, conn, returned_at) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Event-loop lag benchmark: python db_pool.py bench [clicks] [query_ms]
+#
+# Fires `clicks` concurrent coroutines that each run one query taking
+# `query_ms` (pg_sleep stands in for a slow UPDATE): first calling psycopg2
+# straight from the coroutine, as the clicker routes used to, then through
+# ConnectionPool.run. A ticker that wants to wake every TICK_S records how
+# late it actually ran; that lateness is what every SSE stream and chat event
+# in the process sees.
+# ---------------------------------------------------------------------------
+
+TICK_S = 0.01
+
+
+def _slow_query(conn, query_s):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_sleep(%s)", (query_s,))
+    conn.rollback()
+
+
+async def _measure_lag(stop):
+    loop = asyncio.get_running_loop()
+    lags = []
+    while not stop.is_set():
+        expected = loop.time() + TICK_S
+        await asyncio.sleep(TICK_S)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def _bench(label, clicks, click):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_measure_lag(stop))
+    await asyncio.sleep(0)     # let the ticker take its first timestamp
+    started = time.monotonic()
+    await asyncio.gather(*(click() for _ in range(clicks)))
+    elapsed = time.monotonic() - started
+    stop.set()
+    lags = sorted(await ticker)
+
+    def percentile(q):
+        return lags[min(len(lags) - 1, int(q * len(lags)))] * 1000
+
+    print(f"{label:<22}: {clicks} clicks in {elapsed:6.2f} s, loop lag "
+          f"p50 {percentile(0.5):7.1f} ms, p99 {percentile(0.99):7.1f} ms, max {lags[-1] * 1000:7.1f} ms")
+
+
+async def benchmark(dsn, clicks=200, query_ms=20, maxconn=10):
+    query_s = query_ms / 1000
+
+    direct = psycopg2.connect(dsn)
+    try:
+        async def blocking_click():
+            _slow_query(direct, query_s)
+
+        await _bench("blocking on the loop", clicks, blocking_click)
+    finally:
+        direct.close()
+
+    pool = ConnectionPool(dsn, minconn=maxconn, maxconn=maxconn)
+    pool.open()
+    try:
+        def pooled_query():
+            with pool.connection() as conn:
+                _slow_query(conn, query_s)
+
+        async def pooled_click():
+            await pool.run(pooled_query)
+
+        await _bench("ConnectionPool.run", clicks, pooled_click)
+        print(f"Pool: {pool.stats()}")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if sys.argv[1:2] != ["bench"]:
+        print("Usage: python db_pool.py bench [clicks] [query_ms]")
+        sys.exit(1)
+    numbers = [int(arg) for arg in sys.argv[2:4]]
+    asyncio.run(benchmark(os.getenv("DATABASE_URL"), *numbers))
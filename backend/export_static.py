@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+from payloads import EncodedPayload, etag_for
+
+load_dotenv()
+
+# Where nginx serves /transcripts/ from; exporting is skipped when unset
+EXPORT_DIR = os.getenv("TRANSCRIPT_EXPORT_DIR")
+MANIFEST_FILE = "manifest.json"
+# Written once per change and served many times: compress as hard as possible
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def _serialize(row) -> dict:
+    result = dict(row)
+    for key, val in result.items():
+        if hasattr(val, "isoformat"):
+            result[key] = val.isoformat()
+    return result
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_payload(base_path: str, payload: EncodedPayload):
+    """Write <base>.json plus .gz/.br siblings for nginx's gzip_static/brotli_static."""
+    _write_atomic(f"{base_path}.json.gz", payload.gzip_body)
+    _write_atomic(f"{base_path}.json.br", payload.br_body)
+    # Plain file last: its mtime is what nginx uses for the ETag
+    _write_atomic(f"{base_path}.json", payload.body)
+
+
+class StaticExporter:
+    """
+    Writes each VOD's transcript as compact, pre-compressed static files:
+
+        <export_dir>/videos/<vod_id>.json(.gz|.br)   {"video": {...}, "quotes": [...]}
+        <export_dir>/catalog.json(.gz|.br)           every VOD's metadata, newest first
+
+    A manifest of content hashes is kept next to them, so re-exporting a VOD
+    whose rows didn't change touches no files: the JSON is hashed first and
+    only compressed when the hash differs from the manifest's.
+    """
+
+    def __init__(self, conn, export_dir):
+        self.conn = conn
+        self.export_dir = export_dir
+        self.videos_dir = os.path.join(export_dir, "videos")
+        os.makedirs(self.videos_dir, exist_ok=True)
+        self.manifest_path = os.path.join(export_dir, MANIFEST_FILE)
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.manifest = {}
+
+    def export_vods(self, vod_ids) -> int:
+        written = 0
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            for vod_id in sorted(set(vod_ids)):
+                if self._export_vod(cur, vod_id):
+                    written += 1
+            if self._export_catalog(cur):
+                written += 1
+        self.conn.rollback()   # read-only; don't leave the transaction open
+        _write_atomic(self.manifest_path, json.dumps(self.manifest, indent=0).encode())
+        print(f"Static export: {written} file set(s) rewritten.")
+        return written
+
+    def export_all(self) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT vod_id FROM video_catalog")
+            vod_ids = [row[0] for row in cur.fetchall()]
+        return self.export_vods(vod_ids)
+
+    def _export_vod(self, cur, vod_id) -> bool:
+        base_path = os.path.join(self.videos_dir, vod_id)
+        cur.execute(
+            "SELECT vod_id, title, thumbnail, upload_date FROM video_catalog WHERE vod_id = %s",
+            (vod_id,),
+        )
+        video = cur.fetchone()
+        if video is None:
+            # VOD left the catalog: drop its files
+            for suffix in (".json", ".json.gz", ".json.br"):
+                if os.path.exists(base_path + suffix):
+                    os.remove(base_path + suffix)
+            return self.manifest.pop(vod_id, None) is not None
+
+        cur.execute(
+            """
+            SELECT id, vod_id, start_time, end_time, content
+            FROM quotes WHERE vod_id = %s ORDER BY start_time ASC
+            """,
+            (vod_id,),
+        )
+        quotes = cur.fetchall()
+        document = {"video": _serialize(video), "quotes": [_serialize(q) for q in quotes]}
+        return self._write_if_changed(vod_id, base_path, document)
+
+    def _export_catalog(self, cur) -> bool:
+        cur.execute(
+            "SELECT vod_id, title, thumbnail, upload_date FROM video_catalog ORDER BY upload_date DESC, vod_id DESC"
+        )
+        document = {"videos": [_serialize(v) for v in cur.fetchall()]}
+        return self._write_if_changed("__catalog__", os.path.join(self.export_dir, "catalog"), document)
+
+    def _write_if_changed(self, manifest_key, base_path, document) -> bool:
+        etag = etag_for(json.dumps(document, separators=(",", ":")).encode())
+        if self.manifest.get(manifest_key) == etag and os.path.exists(base_path + ".json"):
+            return False
+        payload = EncodedPayload(document, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY)
+        _write_payload(base_path, payload)
+        self.manifest[manifest_key] = payload.etag
+        return True
+
+
+def export_changed(conn, vod_ids):
+    """Pipeline hook: re-export the given VODs if TRANSCRIPT_EXPORT_DIR is configured."""
+    if not EXPORT_DIR or not vod_ids:
+        return
+    try:
+        StaticExporter(conn, EXPORT_DIR).export_vods(vod_ids)
+    except Exception as e:
+        print(f"Static export failed: {e}")
+
+
+if __name__ == "__main__":
+    # python export_static.py [vod_id ...]   (no ids = every VOD, unchanged ones are skipped)
+    import database as db
+
+    if not EXPORT_DIR:
+        print("Set TRANSCRIPT_EXPORT_DIR to export static transcripts.")
+        sys.exit(1)
+    conn = db.connect()
+    try:
+        exporter = StaticExporter(conn, EXPORT_DIR)
+        if sys.argv[1:]:
+            exporter.export_vods(sys.argv[1:])
+        else:
+            exporter.export_all()
+    finally:
+        conn.close()
@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+import sys
+
+# ---------------------------------------------------------------------------
+# Persistent ingest queue (table created by migration 5)
+#
+# One row per VOD in ingest_jobs, moving through
+#   pending -> downloading -> transcribing -> post_processing -> done
+# A failed attempt goes back to pending with an exponential backoff in
+# next_attempt_at, or to failed once MAX_ATTEMPTS is reached. Workers claim
+# rows with FOR UPDATE SKIP LOCKED, so any number of them can run at once
+# without handing out the same VOD twice. A job whose worker died is
+# reclaimed once its lease (locked_at, refreshed on every stage change) is
+# older than LEASE.
+# ---------------------------------------------------------------------------
+
+STATES = ("pending", "downloading", "transcribing", "post_processing", "done", "failed")
+RUNNING_STATES = ("downloading", "transcribing", "post_processing")
+
+MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_S = int(os.getenv("INGEST_BACKOFF_BASE_S", "300"))    # 5 min, 10 min, 20 min, ...
+BACKOFF_MAX_S = 24 * 3600
+LEASE = os.getenv("INGEST_LEASE", "3 hours")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_missing(conn) -> int:
+    """Queue every catalog VOD that has no quotes and no job yet (one anti-join)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO ingest_jobs (vod_id)
+            SELECT v.vod_id
+            FROM video_catalog v
+            WHERE NOT EXISTS (SELECT 1 FROM quotes q WHERE q.vod_id = v.vod_id)
+              AND NOT EXISTS (SELECT 1 FROM ingest_jobs j WHERE j.vod_id = v.vod_id)
+            ORDER BY v.upload_date DESC
+            ON CONFLICT (vod_id) DO NOTHING
+        """)
+        added = cur.rowcount
+    conn.commit()
+    if added:
+        print(f"Queued {added} new ingest job(s).")
+    return added
+
+
+def enqueue(conn, vod_ids, force=False) -> int:
+    """Queue specific VODs; `force` re-runs ones that are done or failed."""
+    on_conflict = "DO NOTHING"
+    if force:
+        on_conflict = """
+            DO UPDATE SET state = 'pending', attempts = 0, next_attempt_at = NOW(),
+                          last_error = NULL, updated_at = NOW()
+            WHERE ingest_jobs.state IN ('done', 'failed')
+        """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO ingest_jobs (vod_id) SELECT UNNEST(%s::text[]) ON CONFLICT (vod_id) {on_conflict}",
+            (list(vod_ids),),
+        )
+        added = cur.rowcount
+    conn.commit()
+    return added
+
+
+def claim_job(conn, worker_id: str):
+    """
+    Take the next runnable job, or None. Returns (vod_id, title, attempts).
+    The claim commits immediately; ownership is the locked_by/locked_at pair.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_jobs j
+            SET state = 'downloading', locked_by = %(worker)s, locked_at = NOW(),
+                attempts = j.attempts + 1, updated_at = NOW()
+            FROM (
+                SELECT vod_id FROM ingest_jobs
+                WHERE (state = 'pending' AND next_attempt_at <= NOW())
+                   OR (state = ANY(%(running)s) AND locked_at < NOW() - %(lease)s::interval)
+                ORDER BY next_attempt_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ) next_job
+            WHERE j.vod_id = next_job.vod_id
+            RETURNING j.vod_id,
+                      (SELECT title FROM video_catalog v WHERE v.vod_id = j.vod_id),
+                      j.attempts
+            """,
+            {"worker": worker_id, "running": list(RUNNING_STATES), "lease": LEASE},
+        )
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def advance(conn, vod_id: str, worker_id: str, state: str, timings: dict = None):
+    """Move an owned job to `state`, merging `timings` ({stage: seconds}) into the job."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_jobs
+            SET state = %s, locked_at = NOW(), updated_at = NOW(),
+                timings = timings || %s::jsonb,
+                locked_by = CASE WHEN %s = 'done' THEN NULL ELSE locked_by END
+            WHERE vod_id = %s AND locked_by = %s
+            """,
+            (state, json.dumps(timings or {}), state, vod_id, worker_id),
+        )
+        owned = cur.rowcount == 1
+    conn.commit()
+    if not owned:
+        raise RuntimeError(f"Lost the lease on ingest job {vod_id}")
+
+
+def fail(conn, vod_id: str, worker_id: str, attempts: int, error: str, timings: dict = None):
+    """Record a failed attempt: retry later with backoff, or give up after MAX_ATTEMPTS."""
+    give_up = attempts >= MAX_ATTEMPTS
+    delay_s = min(BACKOFF_BASE_S * 2 ** (attempts - 1), BACKOFF_MAX_S)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_jobs
+            SET state = %s, last_error = %s, locked_by = NULL, updated_at = NOW(),
+                next_attempt_at = NOW() + make_interval(secs => %s),
+                timings = timings || %s::jsonb
+            WHERE vod_id = %s AND locked_by = %s
+            """,
+            ("failed" if give_up else "pending", error[:2000], delay_s,
+             json.dumps(timings or {}), vod_id, worker_id),
+        )
+    conn.commit()
+    if give_up:
+        print(f"[X] {vod_id} failed {attempts} times, giving up: {error}")
+    else:
+        print(f"[!] {vod_id} attempt {attempts} failed, retrying in {delay_s}s: {error}")
+
+
+def renew_leases(conn, worker_id: str) -> int:
+    """Refresh locked_at on every job `worker_id` holds, e.g. ones prefetched but not yet started."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE ingest_jobs SET locked_at = NOW() WHERE locked_by = %s AND state = ANY(%s)",
+            (worker_id, list(RUNNING_STATES)),
+        )
+        renewed = cur.rowcount
+    conn.commit()
+    return renewed
+
+
+def release(conn, vod_id: str, worker_id: str):
+    """Hand an owned job back to the queue without counting the attempt (never started, or interrupted)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_jobs
+            SET state = 'pending', locked_by = NULL, attempts = GREATEST(attempts - 1, 0), updated_at = NOW()
+            WHERE vod_id = %s AND locked_by = %s
+            """,
+            (vod_id, worker_id),
+        )
+    conn.commit()
+
+
+def queue_status(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("SELECT state, COUNT(*) FROM ingest_jobs GROUP BY state")
+        counts = dict(cur.fetchall())
+        cur.execute("""
+            SELECT key, ROUND(AVG(value::numeric), 1)
+            FROM ingest_jobs, jsonb_each_text(timings)
+            WHERE state = 'done'
+            GROUP BY key
+        """)
+        avg_timings = {key: float(avg) for key, avg in cur.fetchall()}
+    conn.rollback()
+    return {"jobs": {state: counts.get(state, 0) for state in STATES}, "avg_stage_seconds": avg_timings}
+
+
+if __name__ == "__main__":
+    # python ingest_jobs.py status | enqueue-missing | retry <vod_id> ...
+    import database as db
+
+    conn = db.connect()
+    try:
+        command = sys.argv[1] if sys.argv[1:] else "status"
+        if command == "enqueue-missing":
+            enqueue_missing(conn)
+        elif command == "retry":
+            print(f"Re-queued {enqueue(conn, sys.argv[2:], force=True)} job(s).")
+        print(json.dumps(queue_status(conn), indent=2))
+    finally:
+        conn.close()
@@ -0,0 +1,76 @@
+import time
+
+import corrections
+from post_processing import TranscriptionTrimmer
+
+# ---------------------------------------------------------------------------
+# In-memory cleanup between transcription and insert
+#
+# A stage takes the quote list ({"start", "end", "text"} dicts) and returns a
+# new one. Running them before database.save_transcriptions means each quote
+# is written once, already clean, instead of being inserted raw and then
+# rewritten by delete_single_word / process_all_quotes / the corrections job.
+# Those DB passes stay for backfilling rows ingested before this existed.
+# ---------------------------------------------------------------------------
+
+
+def map_text(fn):
+    """Stage applying `fn` to every quote's text."""
+    def stage(quotes):
+        return [{**q, "text": fn(q["text"])} for q in quotes]
+    return stage
+
+
+def filter_quotes(predicate):
+    """Stage keeping the quotes for which `predicate(quote)` is true."""
+    def stage(quotes):
+        return [q for q in quotes if predicate(q)]
+    return stage
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def has_several_words(quote) -> bool:
+    # Same rule as post_processing.delete_single_word, plus empty quotes
+    return " " in quote["text"]
+
+
+class IngestPipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)      # [(name, stage), ...]
+
+    def then(self, name, stage):
+        """A copy of this pipeline with one more stage at the end."""
+        return IngestPipeline(self.stages + [(name, stage)])
+
+    def run(self, quotes):
+        quotes = list(quotes)
+        report = []
+        for name, stage in self.stages:
+            started = time.perf_counter()
+            before = {(q["start"], q["end"]): q["text"] for q in quotes}
+            count_before = len(quotes)
+            quotes = stage(quotes)
+            changed = sum(1 for q in quotes if q["text"] != before.get((q["start"], q["end"]), q["text"]))
+            report.append(
+                f"{name}: {count_before - len(quotes)} dropped, {changed} changed "
+                f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+            )
+        print("Ingest cleanup — " + "; ".join(report))
+        return quotes
+
+
+_trimmer = TranscriptionTrimmer()
+
+DEFAULT_PIPELINE = IngestPipeline([
+    ("normalize", map_text(normalize_text)),
+    ("trim", map_text(_trimmer.process)),
+    ("correct", map_text(corrections.apply_corrections)),
+    ("drop_single_word", filter_quotes(has_several_words)),
+])
+
+
+def clean_quotes(quotes, pipeline=DEFAULT_PIPELINE):
+    return pipeline.run(quotes)
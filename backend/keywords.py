@@ -0,0 +1,98 @@
+import re
+import sys
+
+# ---------------------------------------------------------------------------
+# Tracked keywords — one counter per category on the home page stats
+# ---------------------------------------------------------------------------
+GREM_WORDS = ["Grem", "Grems"]
+CECE_WORDS = ["Cecilia", "Cece"]
+YAOI_WORDS = ["Yaoi"]
+YIPPEE_WORDS = ["Yippee"]
+SIXSEVEN_WORDS = ["6 7", "Six Seven"]
+
+STATS_CATEGORIES = {
+    "grem": GREM_WORDS,
+    "cece": CECE_WORDS,
+    "yaoi": YAOI_WORDS,
+    "yippee": YIPPEE_WORDS,
+    "sixseven": SIXSEVEN_WORDS,
+}
+
+
+def category_patterns() -> list[tuple[str, str]]:
+    """(category, Postgres regex) pairs matching any of the category's words."""
+    patterns = []
+    for key, words in STATS_CATEGORIES.items():
+        alternatives = "|".join(re.escape(w.lower()) for w in words)
+        patterns.append((key, f"\\y(?:{alternatives})\\y"))
+    return patterns
+
+
+def refresh_keyword_stats(cur, vod_ids):
+    """
+    Recount the keyword rollup for the given VODs from their current quotes.
+    Runs inside the caller's transaction, so the counters commit together with
+    the quote changes that made them stale.
+    """
+    vod_ids = sorted(set(vod_ids))
+    if not vod_ids:
+        return
+    cur.execute("DELETE FROM keyword_stats WHERE vod_id = ANY(%s)", (vod_ids,))
+    categories = ", ".join(cur.mogrify("(%s, %s)", p).decode() for p in category_patterns())
+    cur.execute(
+        f"""
+        INSERT INTO keyword_stats (vod_id, category, mentions)
+        SELECT q.vod_id, c.category,
+               SUM(COALESCE(ARRAY_LENGTH(REGEXP_SPLIT_TO_ARRAY(LOWER(q.content), c.pattern), 1) - 1, 0))
+        FROM quotes q
+        CROSS JOIN (VALUES {categories.replace("%", "%%")}) AS c(category, pattern)
+        WHERE q.vod_id = ANY(%s)
+        GROUP BY q.vod_id, c.category
+        """,
+        (vod_ids,),
+    )
+
+
+def backfill_sql() -> str:
+    """
+    The whole-table rollup as one parameterless statement, for the migration
+    that seeds keyword_stats on databases whose quotes predate it. Only VODs
+    with no rollup rows yet are counted, so ones already refreshed at ingest
+    are left alone.
+    """
+    # Dollar-quoted patterns: no escaping rules to get wrong, no parameters needed
+    categories = ", ".join(f"('{key}', $re${pattern}$re$)" for key, pattern in category_patterns())
+    return f"""
+        INSERT INTO keyword_stats (vod_id, category, mentions)
+        SELECT q.vod_id, c.category,
+               SUM(COALESCE(ARRAY_LENGTH(REGEXP_SPLIT_TO_ARRAY(LOWER(q.content), c.pattern), 1) - 1, 0))
+        FROM quotes q
+        CROSS JOIN (VALUES {categories}) AS c(category, pattern)
+        WHERE NOT EXISTS (SELECT 1 FROM keyword_stats k WHERE k.vod_id = q.vod_id)
+        GROUP BY q.vod_id, c.category
+    """
+
+
+def rebuild_keyword_stats(conn):
+    """Recount every VOD. Use after changing the tracked words."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT vod_id FROM quotes")
+        vod_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("TRUNCATE keyword_stats")
+        refresh_keyword_stats(cur, vod_ids)
+    conn.commit()
+    print(f"Rebuilt keyword stats for {len(vod_ids)} VODs.")
+
+
+if __name__ == "__main__":
+    # python keywords.py rebuild
+    import database as db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python keywords.py rebuild")
+        sys.exit(1)
+    conn = db.connect()
+    try:
+        rebuild_keyword_stats(conn)
+    finally:
+        conn.close()
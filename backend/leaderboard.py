@@ -0,0 +1,105 @@
+import asyncio
+import bisect
+import threading
+
+
+class Leaderboard:
+    """
+    In-memory ranking of every user by clicks.
+
+    Loaded once from `users` at startup, then kept current from click flushes
+    and username changes, so the top-K list and any user's rank are served
+    without a DB round trip. Users are kept in a list sorted by
+    (-clicks, uuid), which makes rank lookup a bisect and an update one
+    remove + insort. A periodic reconcile reloads the table to correct drift
+    (e.g. rows changed by hand or by another worker that missed an event).
+    """
+
+    def __init__(self, pool, top_k=10, reconcile_interval_s=300):
+        self.pool = pool
+        self.top_k = top_k
+        self.reconcile_interval_s = reconcile_interval_s
+
+        self._lock = threading.Lock()
+        self._users: dict[str, tuple[str, int]] = {}     # { uuid: (username, clicks) }
+        self._order: list[tuple[int, str]] = []           # sorted [(-clicks, uuid), ...]
+        self._task = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        await self.pool.run(self.reload)
+        self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval_s)
+            try:
+                await self.pool.run(self.reload)
+            except Exception as e:
+                print(f"Leaderboard reconcile failed: {e}")
+
+    def reload(self):
+        """Rebuild the whole ranking from the users table."""
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT uuid, username, clicks FROM users")
+            rows = cur.fetchall()
+        users = {user_uuid: (username, clicks) for user_uuid, username, clicks in rows}
+        order = sorted((-clicks, user_uuid) for user_uuid, (_, clicks) in users.items())
+        with self._lock:
+            self._users, self._order = users, order
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def set_clicks(self, user_uuid: str, clicks: int, username: str | None = None):
+        with self._lock:
+            old = self._users.get(user_uuid)
+            if old is not None:
+                old_name, old_clicks = old
+                self._remove_key((-old_clicks, user_uuid))
+                username = username if username is not None else old_name
+            bisect.insort(self._order, (-clicks, user_uuid))
+            self._users[user_uuid] = (username, clicks)
+
+    def set_username(self, user_uuid: str, username: str):
+        with self._lock:
+            old = self._users.get(user_uuid)
+            if old is not None:
+                self._users[user_uuid] = (username, old[1])
+
+    def _remove_key(self, key):
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def top(self, k: int | None = None) -> list[dict]:
+        with self._lock:
+            return [
+                {"username": self._users[user_uuid][0], "clicks": -neg_clicks}
+                for neg_clicks, user_uuid in self._order[: k or self.top_k]
+            ]
+
+    def rank(self, user_uuid: str) -> int | None:
+        """1-based rank of a user, or None if unknown. Ties share the best rank."""
+        with self._lock:
+            entry = self._users.get(user_uuid)
+            if entry is None:
+                return None
+            return bisect.bisect_left(self._order, (-entry[1], "")) + 1
@@ -0,0 +1,272 @@
+import sys
+import time
+from collections import namedtuple
+
+from keywords import backfill_sql
+from textsearch import TSV_COLUMNS, trigger_sql
+
+# ---------------------------------------------------------------------------
+# Versioned schema migrations
+#
+# Applied in order, once, and recorded in schema_migrations. A Postgres
+# advisory lock (polled, see _acquire_lock) serializes concurrent runners (several API workers starting at
+# once, or an ingest script racing the API), so each version is applied by
+# exactly one of them.
+#
+# A migration is either transactional (plain SQL strings, all-or-nothing) or
+# a list of ConcurrentIndex steps. The latter run outside a transaction with
+# CREATE INDEX CONCURRENTLY so building them on a large table doesn't block
+# reads or writes.
+# ---------------------------------------------------------------------------
+
+MIGRATION_LOCK_KEY = 0x6769_6769   # pg_advisory_lock key, shared by every runner
+LOCK_POLL_S = 0.5
+
+ConcurrentIndex = namedtuple("ConcurrentIndex", ["name", "definition"])
+Migration = namedtuple("Migration", ["version", "name", "steps"])
+
+MIGRATIONS = [
+    Migration(1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS video_catalog (
+            vod_id TEXT PRIMARY KEY,
+            title TEXT,
+            thumbnail TEXT,
+            upload_date DATE,
+            title_tsv tsvector
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS quotes (
+            id SERIAL PRIMARY KEY,
+            vod_id TEXT,
+            start_time FLOAT8,
+            end_time FLOAT8,
+            content TEXT,
+            content_tsv tsvector
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            uuid TEXT PRIMARY KEY,
+            username TEXT UNIQUE,
+            clicks BIGINT NOT NULL DEFAULT 0,
+            coins BIGINT NOT NULL DEFAULT 0,
+            gacha_pulls INT NOT NULL DEFAULT 0,
+            inventory JSONB NOT NULL DEFAULT '[]'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS global_stats (
+            stat_name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT INTO global_stats (stat_name, value) VALUES ('total_clicks', 0) ON CONFLICT DO NOTHING",
+        """
+        CREATE TABLE IF NOT EXISTS keyword_stats (
+            vod_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            mentions BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (vod_id, category)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INT PRIMARY KEY CHECK (id = 1),
+            version BIGINT NOT NULL
+        )
+        """,
+    ]),
+    Migration(2, "search and lookup indexes", [
+        ConcurrentIndex("quotes_content_tsv_idx", "quotes USING GIN (content_tsv)"),
+        ConcurrentIndex("video_catalog_title_tsv_idx", "video_catalog USING GIN (title_tsv)"),
+        ConcurrentIndex("quotes_vod_start_idx", "quotes (vod_id, start_time)"),
+        ConcurrentIndex("video_catalog_upload_date_idx", "video_catalog (upload_date, vod_id)"),
+    ]),
+    # Existing rows keep their old vectors until `python textsearch.py reindex`
+    Migration(3, "tsvector triggers", [
+        sql
+        for table, _, tsv_column, source_column in TSV_COLUMNS
+        for sql in trigger_sql(table, tsv_column, source_column)
+    ]),
+    Migration(4, "job checkpoints", [
+        """
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+    ]),
+    Migration(5, "ingest job queue", [
+        """
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            vod_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL DEFAULT 'pending' CHECK (state IN
+                ('pending', 'downloading', 'transcribing', 'post_processing', 'done', 'failed')),
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            locked_by TEXT,
+            locked_at TIMESTAMPTZ,
+            last_error TEXT,
+            timings JSONB NOT NULL DEFAULT '{}',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        # Only unfinished jobs are ever scanned for work
+        """
+        CREATE INDEX IF NOT EXISTS ingest_jobs_runnable_idx
+        ON ingest_jobs (next_attempt_at) WHERE state NOT IN ('done', 'failed')
+        """,
+    ]),
+    # keyword_stats is only refreshed for VODs written after it existed; count
+    # everything already there once so /api/stats isn't partial
+    Migration(6, "backfill keyword stats", [backfill_sql()]),
+    # Keyset pages order on COALESCE(upload_date, '-infinity') so undated videos paginate
+    Migration(7, "sort-date index", [
+        ConcurrentIndex(
+            "video_catalog_sort_date_idx",
+            "video_catalog ((COALESCE(upload_date, '-infinity'::date)), vod_id)",
+        ),
+    ]),
+    # Migration 1's UNIQUE only reaches fresh databases (CREATE TABLE IF NOT
+    # EXISTS). Rename duplicates, keeping the name for its top clicker, then
+    # index. users is one small row per player, so a plain index built in the
+    # same transaction is brief and leaves no window for a new duplicate.
+    Migration(8, "unique usernames", [
+        """
+        UPDATE users u SET username = 'grem-' || LEFT(u.uuid, 10)
+        FROM (
+            SELECT uuid, ROW_NUMBER() OVER (PARTITION BY username ORDER BY clicks DESC, uuid) AS rn
+            FROM users WHERE username IS NOT NULL
+        ) d
+        WHERE d.uuid = u.uuid AND d.rn > 1
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS users_username_key ON users (username)",
+    ]),
+]
+
+
+def _is_concurrent(migration) -> bool:
+    return all(isinstance(step, ConcurrentIndex) for step in migration.steps)
+
+
+def _applied_versions(cur) -> set:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def _create_index_concurrently(cur, index):
+    # An interrupted CONCURRENTLY build leaves an INVALID index behind that
+    # IF NOT EXISTS would happily skip; drop it and build again.
+    cur.execute(
+        """
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """,
+        (index.name,),
+    )
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        print(f"  Dropping invalid index {index.name}")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {index.definition}")
+
+
+def _apply(conn, migration):
+    if _is_concurrent(migration):
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for index in migration.steps:
+                print(f"  Building index {index.name}")
+                _create_index_concurrently(cur, index)
+        conn.autocommit = False
+    else:
+        with conn.cursor() as cur:
+            for sql in migration.steps:
+                cur.execute(sql)
+    # Transactional steps commit together with their version row
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+            (migration.version, migration.name),
+        )
+    conn.commit()
+
+
+def _acquire_lock(conn):
+    # Poll instead of blocking in pg_advisory_lock: a session waiting inside
+    # that call holds a snapshot, and CREATE INDEX CONCURRENTLY in the session
+    # that owns the lock waits for every older snapshot to go away, so the
+    # two would wait on each other. Between tries (autocommit) we hold none.
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            if cur.fetchone()[0]:
+                return
+        time.sleep(LOCK_POLL_S)
+
+
+def migrate(conn) -> int:
+    """Apply every pending migration on `conn`. Returns how many were applied."""
+    conn.rollback()
+    conn.autocommit = True
+    applied_now = 0
+    try:
+        # Session-level lock: held across the per-migration transactions below
+        _acquire_lock(conn)
+        try:
+            with conn.cursor() as cur:
+                applied = _applied_versions(cur)
+            conn.autocommit = False
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                print(f"Applying migration {migration.version}: {migration.name}")
+                try:
+                    _apply(conn, migration)
+                except Exception:
+                    if not conn.autocommit:
+                        conn.rollback()
+                    raise
+                applied_now += 1
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    finally:
+        conn.autocommit = False
+    if applied_now:
+        print(f"Schema is at version {MIGRATIONS[-1].version} ({applied_now} migration(s) applied).")
+    return applied_now
+
+
+def current_version(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+if __name__ == "__main__":
+    # python migrations.py          apply pending migrations
+    # python migrations.py status   show the applied version
+    import database as db
+
+    conn = db.connect()
+    try:
+        if sys.argv[1:] == ["status"]:
+            with conn.cursor() as cur:
+                print(f"Schema version {current_version(cur)} of {MIGRATIONS[-1].version}")
+        else:
+            migrate(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,156 @@
+import random
+import re
+import sys
+import time
+
+# ---------------------------------------------------------------------------
+# Phrase-loop removal ("I think that I think that" -> "I think that")
+#
+# Semantics (unchanged from the original TranscriptionTrimmer implementation):
+# for each phrase length L from max_phrase_words down to 1, scan left to
+# right; whenever words[i:i+L] == words[i+L:i+2L], delete the second copy and
+# look at position i again, otherwise move on to i+1.
+#
+# The original deleted from a Python list in place and compared slices at
+# every position: O(n^2) per length on long Whisper hallucination loops.
+#
+# Here a pass streams this length's input `src` into an append-only output
+# `res`, with j the next unread input position: "delete the second copy" is
+# "skip L input words", "move on" is "append src[j]". Starting from
+# res = src[:L], j = L, the last L words of `res` always equal src[j-L:j]
+# (an append shifts both windows by one; a skip only happens when
+# src[j-L:j] == src[j:j+L], so the new src[j-L:j] is the same phrase).
+# Whether to skip at j therefore depends on `src` alone: j must start a
+# "square" src[j-L:j] == src[j:j+L]. Those are found in one pass from the
+# runs of src[k] == src[k+L] (a run of >= L equal positions), and the walk
+# jumps from one square to the next copying the words in between.
+# Each pass is O(n), the whole thing O(n * max_phrase_words).
+# ---------------------------------------------------------------------------
+
+
+def _square_starts(src, length):
+    """Every j with src[j-length:j] == src[j:j+length], ascending."""
+    equal = bytes(a == b for a, b in zip(src, src[length:]))
+    starts = []
+    for run in re.finditer(b"\x01{%d,}" % length, equal):
+        # equal[k] for k in [run.start(), run.end()) -> squares at j = k + 1 once `length` deep
+        starts.extend(range(run.start() + length, run.end() + 1))
+    return starts
+
+
+def _remove_loops_of_length(src, length):
+    n = len(src)
+    if n < 2 * length:
+        return src
+    res = src[:length]
+    j = length
+    for start in _square_starts(src, length):
+        if start < j:
+            continue                      # inside a copy that was already dropped
+        res.extend(src[j:start])
+        j = start + length                # drop the repeated copy
+    res.extend(src[j:])
+    return res
+
+
+def remove_phrase_loops(words, max_phrase_words=5):
+    """Collapse immediately repeated phrases of up to `max_phrase_words` words."""
+    words = list(words)
+    for length in range(max_phrase_words, 0, -1):
+        words = _remove_loops_of_length(words, length)
+    return words
+
+
+def reference_remove_phrase_loops(words, max_phrase_words=5):
+    """The original quadratic implementation, kept to check equivalence against."""
+    words = list(words)
+    n = len(words)
+    for length in range(max_phrase_words, 0, -1):
+        i = 0
+        while i <= n - (length * 2):
+            if words[i:i + length] == words[i + length:i + (length * 2)]:
+                del words[i + length:i + (length * 2)]
+                n = len(words)
+            else:
+                i += 1
+    return words
+
+
+# ---------------------------------------------------------------------------
+# Equivalence corpus + micro-benchmark: python phrase_loops.py [bench]
+# ---------------------------------------------------------------------------
+
+EQUIVALENCE_CORPUS = [
+    "",
+    "hello",
+    "the the",
+    "I think that I think that",
+    "I think that I think that I think that we should go",
+    "a b a b a b a",
+    "a a b b a a b b",
+    "yes yes yes no no yes",
+    "so so so so so so so so so so",
+    "one two three four five one two three four five one two three four five six",
+    "one two three four five six one two three four five six",
+    "we we we love love grem grem grem we love grem",
+    "Grem grem GREM grem",
+    "a b c a b c a b d a b d",
+    "x y x y z x y x y z",
+    "thank you thank you thank you for the sub for the sub",
+]
+
+
+def _random_case(rng):
+    vocab = [f"w{k}" for k in range(rng.randint(1, 6))]
+    words = []
+    while len(words) < rng.randint(0, 60):
+        phrase = [rng.choice(vocab) for _ in range(rng.randint(1, 7))]
+        words.extend(phrase * rng.randint(1, 4))
+    return words
+
+
+def check_equivalence(random_cases=5000, seed=0):
+    rng = random.Random(seed)
+    cases = [text.split() for text in EQUIVALENCE_CORPUS]
+    cases += [_random_case(rng) for _ in range(random_cases)]
+    for words in cases:
+        for max_len in (1, 3, 5, 8):
+            expected = reference_remove_phrase_loops(words, max_len)
+            actual = remove_phrase_loops(words, max_len)
+            if actual != expected:
+                raise AssertionError(f"Mismatch for {words!r} (max {max_len}): {actual!r} != {expected!r}")
+    print(f"OK: {len(cases)} cases identical to the reference implementation.")
+
+
+def _bench_inputs(size, rng):
+    # A Whisper-style hallucination: one short phrase looping, with noise
+    loop = "thank you for watching".split()
+    hallucination = []
+    while len(hallucination) < size:
+        hallucination.extend(loop if rng.random() < 0.9 else [f"w{rng.randint(0, 50)}"])
+    # Many short repeats spread over a long segment: one list deletion each in the original
+    scattered = []
+    while len(scattered) < size:
+        phrase = [f"w{rng.randint(0, 10_000)}" for _ in range(rng.randint(1, 5))]
+        scattered.extend(phrase * 2)
+    return {"hallucination loop": hallucination, "scattered repeats": scattered}
+
+
+def benchmark(sizes=(1_000, 10_000, 50_000), max_phrase_words=5):
+    rng = random.Random(1)
+    for size in sizes:
+        for label, words in _bench_inputs(size, rng).items():
+            timings = {}
+            for name, fn in (("reference", reference_remove_phrase_loops), ("linear", remove_phrase_loops)):
+                started = time.perf_counter()
+                fn(words, max_phrase_words)
+                timings[name] = time.perf_counter() - started
+            speedup = timings["reference"] / max(timings["linear"], 1e-9)
+            print(f"{size:>7} words, {label:<18}: reference {timings['reference'] * 1000:9.1f} ms, "
+                  f"linear {timings['linear'] * 1000:7.1f} ms ({speedup:.0f}x)")
+
+
+if __name__ == "__main__":
+    check_equivalence()
+    if sys.argv[1:] == ["bench"]:
+        benchmark()
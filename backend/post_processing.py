@@ -1,8 +1,21 @@
+import os
 import re
 import database as db
+import batch_rewrite
+import corrections
+import keywords
+import phrase_loops
+from data_version import bump_data_version
+from export_static import export_changed
+
+# Processes used for trimming; 0 means one per CPU core
+TRIM_WORKERS = int(os.getenv("TRIM_WORKERS", "1"))
+# Longest repeated phrase (in words) collapsed by remove_phrase_loops
+TRIM_MAX_PHRASE_WORDS = int(os.getenv("TRIM_MAX_PHRASE_WORDS", "5"))
 
 class TranscriptionTrimmer:
-    def __init__(self):
+    def __init__(self, max_phrase_words=TRIM_MAX_PHRASE_WORDS):
+        self.max_phrase_words = max_phrase_words
         # Updated pattern: Matches a word followed by itself one or more times
         # Separated by spaces OR hyphens: e.g., "fizz-fizz-fizz" or "the the"
         self.stutter_pattern = re.compile(r'\b(\w+)(?:[\s-]+(\1\b))+', re.IGNORECASE)
@@ -12,32 +25,16 @@ class TranscriptionTrimmer:
         #
         return self.stutter_pattern.sub(r'\1', text)
 
-    def remove_phrase_loops(self, text: str, max_phrase_words: int = 5) -> str:
+    def remove_phrase_loops(self, text: str, max_phrase_words: int = None) -> str:
         """
         Detects and trims repeating sequences of words (loops).
         Example: 'I think that I think that' -> 'I think that'
+        Linear-time per phrase length; see phrase_loops.py.
         """
-        #
         words = text.split()
         if not words:
             return ""
-
-        n = len(words)
-        # Iterate backwards to catch the longest possible loops first
-        for length in range(max_phrase_words, 0, -1):
-            i = 0
-            while i <= n - (length * 2):
-                phrase = words[i : i + length]
-                next_phrase = words[i + length : i + (length * 2)]
-                
-                if phrase == next_phrase:
-                    # Found a repeat! Remove the second instance
-                    del words[i + length : i + (length * 2)]
-                    n = len(words)
-                else:
-                    i += 1
-        
-        return " ".join(words)
+        return " ".join(phrase_loops.remove_phrase_loops(words, max_phrase_words or self.max_phrase_words))
 
     def process(self, text: str) -> str:
         """Complete pipeline for trimming stutters, loops, and trailing punctuation."""
@@ -50,96 +47,39 @@ class TranscriptionTrimmer:
         # 3. Final cleanup of whitespace and trailing hyphens from stutters
         return " ".join(text.split()).strip("- ")
 
-    def process_all_quotes_in_db(self):
+    def trim_rows(self, rows):
+        """(id, vod_id, content) rows -> [(id, vod_id, cleaned_content)] for rows that changed."""
+        changes = []
+        for quote_id, vod_id, content in rows:
+            cleaned_content = self.process(content)
+            if cleaned_content != content:
+                changes.append((quote_id, vod_id, cleaned_content))
+        return changes
+
+    def process_all_quotes_in_db(self, batch_size=batch_rewrite.DEFAULT_BATCH_SIZE, resume=True, workers=TRIM_WORKERS):
         """
-        Fetches ALL quotes from the database, applies trimming logic,
-        and updates records only if changes were made.
+        Streams ALL quotes from the database through the trimming logic and
+        writes back the changed ones in batches (see batch_rewrite.rewrite_quotes).
+        Safe to interrupt: the next run resumes after the last committed batch.
         """
-        #
-        conn = None
-        try:
-            conn = db.connect()
-            cur = conn.cursor()
-
-            cur.execute("SELECT id, content FROM quotes")
-            rows = cur.fetchall()
-
-            total_updated = 0
-            print(f"Processing all {len(rows)} quotes in database...")
-
-            for quote_id, content in rows:
-                if not content: continue
-                cleaned_content = self.process(content)
-
-                if cleaned_content != content:
-                    # UPDATED QUERY:
-                    cur.execute("""
-                        UPDATE quotes 
-                        SET content = %s, 
-                            content_tsv = to_tsvector('simple', %s) 
-                        WHERE id = %s
-                    """, (cleaned_content, cleaned_content, quote_id))
-                    total_updated += 1
-
-            conn.commit()
-            print(f"Success! Cleaned and updated {total_updated} quotes.")
-
-        except Exception as e:
-            print(f"An error occurred during bulk DB processing: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
-
-    def process_all_quotes(self, vod_id):
+        return batch_rewrite.rewrite_quotes(
+            "trim_quotes", self.trim_rows, batch_size=batch_size, resume=resume, workers=workers,
+        )
+
+    def process_all_quotes(self, vod_id, workers=TRIM_WORKERS):
         """
-        Fetches quotes for a specific VOD, applies trimming logic, and updates records.
+        Applies the trimming logic to one VOD's quotes and writes back the changed ones.
         """
-        #
-        conn = None
-        try:
-            conn = db.connect()
-            cur = conn.cursor()
-
-            query = "SELECT id, content FROM quotes WHERE vod_id = %s"
-            cur.execute(query, (vod_id,))
-            rows = cur.fetchall()
-
-            total_updated = 0
-            print(f"Processing {len(rows)} quotes for VOD ID: {vod_id}...")
-
-            for quote_id, content in rows:
-                if not content: continue
-                cleaned_content = self.process(content)
-
-                if cleaned_content != content:
-                    # UPDATED QUERY:
-                    cur.execute("""
-                        UPDATE quotes 
-                        SET content = %s, 
-                            content_tsv = to_tsvector('simple', %s) 
-                        WHERE id = %s
-                    """, (cleaned_content, cleaned_content, quote_id))
-                    total_updated += 1
-
-            conn.commit()
-            print(f"Success! Cleaned and updated {total_updated} quotes for VOD {vod_id}.")
-
-        except Exception as e:
-            print(f"An error occurred during VOD processing: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
+        print(f"Processing quotes for VOD ID: {vod_id}...")
+        return batch_rewrite.rewrite_quotes(
+            f"trim_quotes:{vod_id}", self.trim_rows, vod_id=vod_id, workers=workers,
+        )
 
 def replace_word(word_to_fix, target_word):
     """
     Replaces a word while preserving its casing (lowercase, Capitalized, or UPPERCASE)
     in the 'content' column of the 'quotes' table.
+    For one-off fixes; recurring ones belong in corrections.CORRECTIONS.
     """
     # Prepare the variations
     variants = [
@@ -154,19 +94,27 @@ def replace_word(word_to_fix, target_word):
         cur = conn.cursor()
 
         total_affected = 0
+        changed_vods = set()
         
         # We iterate through the variations to ensure exact case matching
         for variant in variants:
             sql = """
                 UPDATE quotes 
                 SET content = REPLACE(content, %s, %s)
-                WHERE content LIKE %s;
+                WHERE content LIKE %s
+                RETURNING vod_id;
             """
             search_pattern = f"%{variant}%"
             cur.execute(sql, (variant, target_word, search_pattern))
             total_affected += cur.rowcount
+            changed_vods.update(row[0] for row in cur.fetchall())
 
+        keywords.refresh_keyword_stats(cur, changed_vods)
+        if changed_vods:
+            bump_data_version(cur)
         conn.commit()
+        if changed_vods:
+            export_changed(conn, changed_vods)
         print(f"Update complete. Total instances modified: {total_affected}")
 
     except Exception as e:
@@ -198,8 +146,13 @@ def delete_single_word(vod_id):
         
         cur.execute(sql, (vod_id,))
         total_deleted = cur.rowcount
-        
+
+        if total_deleted:
+            keywords.refresh_keyword_stats(cur, [vod_id])
+            bump_data_version(cur)
         conn.commit()
+        if total_deleted:
+            export_changed(conn, [vod_id])
         print(f"Cleanup complete for VOD {vod_id}. Deleted {total_deleted} single-word quotes.")
 
     except Exception as e:
@@ -220,26 +173,5 @@ if __name__ == '__main__':
     trimmer = TranscriptionTrimmer()
     trimmer.process_all_quotes(id)
 
-    replace_word("yowie", "yaoi")
-    replace_word("So see the immigrants", "Cecilia Immergreen")
-    replace_word("more coliope", "Mori Calliope")
-    replace_word("league of legends", "League of Legends")
-    replace_word("callie", "Calli")
-    replace_word("muddin", "Murin")
-    replace_word("jiji", "Gigi")
-    replace_word("Gigi tomo", "Gigi-Tomo")
-    replace_word("yowi", "yaoi")
-    replace_word("immigreen", "Immergreen")
-    replace_word("mcgrew", "Immergreen")
-    replace_word("ebbinggwee", "Immergreen")
-    replace_word("emmergreen", "Immergreen")
-    replace_word("emmergree", "Immergreen")
-    replace_word("ceci", "Cece")
-    replace_word("seci", "Cece")
-    replace_word("cc", "Cece")
-    replace_word("cici", "Cece")
-    replace_word("grams", "grems")
-    replace_word("gram", "grem")
-    replace_word("Oral Crony", "Ouro Kronii")
-    replace_word("jimoonie", "Gimurin")
-    replace_word("jimunin", "Gimurin")
\ No newline at end of file
+    # One pass over the table for the whole dictionary (see corrections.py)
+    corrections.apply_corrections_in_db()
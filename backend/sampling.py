@@ -0,0 +1,212 @@
+import math
+import random
+import threading
+import time
+
+from psycopg2.extras import RealDictCursor
+
+
+class QuoteSampler:
+    """
+    Uniform random quotes without ORDER BY RANDOM().
+
+    Quote ids are a SERIAL, so we draw random ids from [min(id), max(id)] and
+    fetch them by primary key. Ids that no longer exist (rows removed by
+    delete_single_word, VODs missing from the catalog) simply miss and are
+    redrawn, which keeps the sample uniform over the rows that do exist.
+    The number of ids drawn per round is scaled by the table's density
+    (planner row estimate / id span), so a typical call is one index lookup.
+    """
+
+    def __init__(self, pool, bounds_ttl_s=60, max_rounds=5):
+        self.pool = pool
+        self.bounds_ttl_s = bounds_ttl_s
+        self.max_rounds = max_rounds
+        self._lock = threading.Lock()
+        self._bounds = None          # (min_id, max_id, estimated_rows)
+        self._bounds_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._bounds_at = 0.0
+
+    def sample(self, k: int) -> list[dict]:
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            bounds = self._get_bounds(cur)
+            if bounds is None:
+                return []
+            min_id, max_id, est_rows = bounds
+            span = max_id - min_id + 1
+            density = min(1.0, max(est_rows / span, 0.01))
+
+            found = {}
+            for _ in range(self.max_rounds):
+                need = k - len(found)
+                if need <= 0:
+                    break
+                n = min(span, math.ceil(need / density * 1.5) + 5)
+                candidates = [i for i in random.sample(range(min_id, max_id + 1), n) if i not in found]
+                cur.execute(
+                    """
+                    SELECT v.*, q.id AS quote_id, q.content, q.start_time as time
+                    FROM quotes q
+                    JOIN video_catalog v ON q.vod_id = v.vod_id
+                    WHERE q.id = ANY(%s)
+                    """,
+                    (candidates,),
+                )
+                rows = {row["quote_id"]: row for row in cur.fetchall()}
+                # Keep the random draw order so the cut at `need` stays uniform
+                for quote_id in candidates:
+                    if quote_id in rows and len(found) < k:
+                        found[quote_id] = rows[quote_id]
+
+            if len(found) < k:
+                # Extremely sparse ids (or a tiny table): fall back to a full shuffle
+                cur.execute(
+                    """
+                    SELECT v.*, q.id AS quote_id, q.content, q.start_time as time
+                    FROM quotes q
+                    JOIN video_catalog v ON q.vod_id = v.vod_id
+                    WHERE NOT (q.id = ANY(%s))
+                    ORDER BY RANDOM()
+                    LIMIT %s
+                    """,
+                    (list(found), k - len(found)),
+                )
+                for row in cur.fetchall():
+                    found[row["quote_id"]] = row
+
+        return list(found.values())
+
+    def _get_bounds(self, cur):
+        with self._lock:
+            if self._bounds is not None and time.monotonic() - self._bounds_at < self.bounds_ttl_s:
+                return self._bounds
+
+        cur.execute("""
+            SELECT MIN(id) AS min_id, MAX(id) AS max_id,
+                   (SELECT reltuples FROM pg_class WHERE oid = 'quotes'::regclass) AS est_rows
+            FROM quotes
+        """)
+        row = cur.fetchone()
+        if row["min_id"] is None:
+            return None
+        span = row["max_id"] - row["min_id"] + 1
+        # reltuples is -1 (or stale) before the first ANALYZE; assume the ids are dense then
+        est_rows = row["est_rows"] if row["est_rows"] and row["est_rows"] > 0 else span
+        bounds = (row["min_id"], row["max_id"], min(est_rows, span))
+        with self._lock:
+            self._bounds, self._bounds_at = bounds, time.monotonic()
+        return bounds
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: python sampling.py bench [rows] [runs]
+#
+# Builds TEMP copies of quotes and video_catalog (they shadow the real tables
+# for this session only, nothing persistent is touched), fills them with
+# `rows` quotes, deletes ~10% at random the way delete_single_word would, and
+# times QuoteSampler.sample against the ORDER BY RANDOM() query it replaced.
+# ---------------------------------------------------------------------------
+
+BENCH_SAMPLE_SIZE = 10
+BENCH_VODS = 2000
+
+RANDOM_ORDER_SQL = """
+    SELECT v.*, q.id AS quote_id, q.content, q.start_time as time
+    FROM quotes q
+    JOIN video_catalog v ON q.vod_id = v.vod_id
+    ORDER BY RANDOM()
+    LIMIT %s
+"""
+
+
+def _fill_bench_tables(conn, rows):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE video_catalog (
+                vod_id TEXT PRIMARY KEY, title TEXT, thumbnail TEXT, upload_date DATE
+            )
+        """)
+        cur.execute("""
+            CREATE TEMP TABLE quotes (
+                id SERIAL PRIMARY KEY, vod_id TEXT, start_time FLOAT8, end_time FLOAT8, content TEXT
+            )
+        """)
+        cur.execute(
+            """
+            INSERT INTO video_catalog
+            SELECT 'vod' || n, 'Stream ' || n, '', DATE '2023-01-01' + n
+            FROM generate_series(1, %s) n
+            """,
+            (BENCH_VODS,),
+        )
+        cur.execute(
+            """
+            INSERT INTO quotes (vod_id, start_time, end_time, content)
+            SELECT 'vod' || (1 + n %% %s), n, n + 2, 'quote number ' || n || ' goes here'
+            FROM generate_series(1, %s) n
+            """,
+            (BENCH_VODS, rows),
+        )
+        cur.execute("DELETE FROM quotes WHERE random() < 0.1")
+        cur.execute("ANALYZE quotes")
+        cur.execute("ANALYZE video_catalog")
+        cur.execute("SELECT COUNT(*) FROM quotes")
+        remaining = cur.fetchone()[0]
+    conn.commit()
+    return remaining
+
+
+def _time_runs(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+        assert len(result) == BENCH_SAMPLE_SIZE, len(result)
+    timings.sort()
+    return sum(timings) / runs * 1000, timings[min(runs - 1, int(runs * 0.95))] * 1000
+
+
+def benchmark(dsn, rows=1_000_000, runs=50):
+    from db_pool import ConnectionPool
+
+    # One connection, so every query sees the session's TEMP tables
+    pool = ConnectionPool(dsn, minconn=1, maxconn=1)
+    pool.open()
+    try:
+        with pool.connection() as conn:
+            started = time.perf_counter()
+            remaining = _fill_bench_tables(conn, rows)
+            print(f"Filled {remaining} quotes in {time.perf_counter() - started:.1f} s")
+
+        def random_order():
+            with pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(RANDOM_ORDER_SQL, (BENCH_SAMPLE_SIZE,))
+                return cur.fetchall()
+
+        sampler = QuoteSampler(pool)
+        for label, fn in (
+            ("ORDER BY RANDOM()", random_order),
+            ("QuoteSampler.sample", lambda: sampler.sample(BENCH_SAMPLE_SIZE)),
+        ):
+            mean_ms, p95_ms = _time_runs(fn, runs)
+            print(f"{label:<20}: mean {mean_ms:8.2f} ms, p95 {p95_ms:8.2f} ms over {runs} runs")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if sys.argv[1:2] != ["bench"]:
+        print("Usage: python sampling.py bench [rows] [runs]")
+        sys.exit(1)
+    numbers = [int(arg) for arg in sys.argv[2:4]]
+    benchmark(os.getenv("DATABASE_URL"), *numbers)
@@ -0,0 +1,135 @@
+import sys
+import time
+
+import psycopg2
+
+from data_version import bump_data_version
+
+# ---------------------------------------------------------------------------
+# Text-search configuration — the single place it is defined
+#
+# quotes.content_tsv and video_catalog.title_tsv are filled by triggers
+# (migration 3) from this config, and every tsquery the API builds uses it,
+# so index contents no longer depend on which code path last wrote a row.
+# Changing it means a new migration recreating the triggers, then
+# `python textsearch.py reindex`.
+# ---------------------------------------------------------------------------
+TS_CONFIG = "simple"
+
+REINDEX_BATCH_SIZE = 2000
+REINDEX_PAUSE_S = 0.05        # breathing room for live traffic between batches
+REINDEX_LOCK_TIMEOUT = "2s"   # give up on a batch rather than queue behind a long lock
+
+# (table, key column, tsvector column, source column)
+TSV_COLUMNS = [
+    ("quotes", "id", "content_tsv", "content"),
+    ("video_catalog", "vod_id", "title_tsv", "title"),
+]
+
+
+def trigger_sql(table: str, tsv_column: str, source_column: str) -> list[str]:
+    """DDL for the trigger keeping `tsv_column` in step with `source_column`."""
+    function = f"{table}_{tsv_column}_update"
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            NEW.{tsv_column} := to_tsvector('{TS_CONFIG}', COALESCE(NEW.{source_column}, ''));
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {function} ON {table}",
+        f"""
+        CREATE TRIGGER {function}
+        BEFORE INSERT OR UPDATE OF {source_column} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {function}()
+        """,
+    ]
+
+
+def reindex_table(conn, table, key_column, tsv_column, source_column, batch_size=REINDEX_BATCH_SIZE):
+    """
+    Recompute `tsv_column` for every row in key order, one short committed
+    transaction per batch. Rows that are already current are skipped, so
+    re-running after an interruption only does the remaining work.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SET lock_timeout = '{REINDEX_LOCK_TIMEOUT}'")
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+        estimated = max(cur.fetchone()[0], 0)
+    conn.commit()
+
+    expected = f"to_tsvector('{TS_CONFIG}', COALESCE(t.{source_column}, ''))"
+    sql = f"""
+        WITH batch AS (
+            SELECT {key_column} FROM {table}
+            {{where}}
+            ORDER BY {key_column}
+            LIMIT %(limit)s
+        ), updated AS (
+            UPDATE {table} t SET {tsv_column} = {expected}
+            FROM batch b
+            WHERE t.{key_column} = b.{key_column}
+              AND t.{tsv_column} IS DISTINCT FROM {expected}
+            RETURNING 1
+        )
+        SELECT (SELECT MAX({key_column}) FROM batch),
+               (SELECT COUNT(*) FROM batch),
+               (SELECT COUNT(*) FROM updated)
+    """
+
+    after, scanned, changed = None, 0, 0
+    started = time.monotonic()
+    while True:
+        try:
+            with conn.cursor() as cur:
+                where = f"WHERE {key_column} > %(after)s" if after is not None else ""
+                cur.execute(sql.format(where=where), {"after": after, "limit": batch_size})
+                last_key, batch_rows, batch_changed = cur.fetchone()
+            conn.commit()
+        except psycopg2.errors.LockNotAvailable:
+            conn.rollback()
+            print(f"  {table}: batch after {after!r} hit a lock, retrying...")
+            time.sleep(1)
+            continue
+
+        if not batch_rows:
+            break
+        after = last_key
+        scanned += batch_rows
+        changed += batch_changed
+        pct = f"{min(100.0, scanned / estimated * 100):.1f}%" if estimated else "?"
+        rate = scanned / max(time.monotonic() - started, 1e-6)
+        print(f"  {table}: {scanned} scanned ({pct}), {changed} updated, {rate:.0f} rows/s")
+        time.sleep(REINDEX_PAUSE_S)
+
+    return scanned, changed
+
+
+def reindex_all(conn, batch_size=REINDEX_BATCH_SIZE):
+    total_changed = 0
+    for table, key_column, tsv_column, source_column in TSV_COLUMNS:
+        print(f"Re-indexing {table}.{tsv_column} with '{TS_CONFIG}'...")
+        scanned, changed = reindex_table(conn, table, key_column, tsv_column, source_column, batch_size)
+        print(f"Done: {scanned} rows scanned, {changed} updated.")
+        total_changed += changed
+    if total_changed:
+        # Cached search results were computed against the old vectors
+        with conn.cursor() as cur:
+            bump_data_version(cur)
+        conn.commit()
+
+
+if __name__ == "__main__":
+    # python textsearch.py reindex [batch_size]
+    import database as db
+
+    if not sys.argv[1:] or sys.argv[1] != "reindex":
+        print("Usage: python textsearch.py reindex [batch_size]")
+        sys.exit(1)
+    conn = db.connect()
+    try:
+        reindex_all(conn, int(sys.argv[2]) if len(sys.argv) > 2 else REINDEX_BATCH_SIZE)
+    finally:
+        conn.close()
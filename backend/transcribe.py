@@ -1,18 +1,25 @@
 import os
 import sys
+import time
 import yt_dlp
 # from faster_whisper import WhisperModel
-import whisper_s2t
-
-# Cuda target path fix
-target_path = "/home/sherm/GigiQuotes/.venv/lib/python3.12/site-packages/nvidia/cudnn/lib"
-if target_path not in os.environ.get("LD_LIBRARY_PATH", ""):
-    os.environ["LD_LIBRARY_PATH"] = target_path + ":" + os.environ.get("LD_LIBRARY_PATH", "")
-    os.execv(sys.executable, [sys.executable] + sys.argv)
 
 # Set paths
 AUDIO_DIR = "audio_cache"
 
+# Backends picked by the ingest worker (see make_transcriber / make_audio_source)
+TRANSCRIBER = os.getenv("INGEST_TRANSCRIBER", "whisper")        # whisper | stub
+AUDIO_SOURCE = os.getenv("INGEST_AUDIO_SOURCE", "youtube")      # youtube | local:<directory>
+
+
+def _ensure_cuda_libs():
+    # Cuda target path fix: the loader reads LD_LIBRARY_PATH at startup, so re-exec once with it set.
+    # Runs before whisper_s2t is imported, i.e. before any work has started.
+    target_path = "/home/sherm/GigiQuotes/.venv/lib/python3.12/site-packages/nvidia/cudnn/lib"
+    if target_path not in os.environ.get("LD_LIBRARY_PATH", ""):
+        os.environ["LD_LIBRARY_PATH"] = target_path + ":" + os.environ.get("LD_LIBRARY_PATH", "")
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
 # def transcribe_with_faster_whisper():
 #     print("--- Starting Faster-Whisper ---")
 #     # Model: "base", "small", "medium", or "large-v3"
@@ -82,23 +89,119 @@ def download_audio(video_id):
     except Exception as e:
         return None
 
+# ---------------------------------------------------------------------------
+# Transcribers: anything with transcribe(audio_path) -> [{"start", "end", "text"}]
+# ---------------------------------------------------------------------------
+
+class WhisperS2TTranscriber:
+    """Whisper-S2T on the GPU. The model is loaded once and reused for every VOD."""
+
+    def __init__(self, model_identifier="small", device="cuda", compute_type="float16", batch_size=16):
+        _ensure_cuda_libs()
+        import whisper_s2t
+
+        self.batch_size = batch_size
+        self.model = whisper_s2t.load_model(
+            model_identifier=model_identifier, device=device, compute_type=compute_type,
+        )
+
+    def transcribe(self, audio_path):
+        print("\n--- Starting Whisper-S2T (Optimized Pipeline) ---")
+        out = self.model.transcribe_with_vad(
+            [audio_path],
+            lang_codes=['en'],
+            tasks=['transcribe'],
+            batch_size=self.batch_size
+        )
+
+        results = []
+        for segment in out[0]:
+            results.append({
+                "start": float(segment['start_time']),
+                "end": float(segment['end_time']),
+                "text": str(segment['text']).strip()
+            })
+        return results
+
+
+class StubTranscriber:
+    """CPU stand-in for exercising the ingest pipeline without a model."""
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+
+    def transcribe(self, audio_path):
+        time.sleep(self.delay_s)
+        name = os.path.splitext(os.path.basename(audio_path))[0]
+        return [
+            {"start": 0.0, "end": 2.5, "text": f"stub transcript for {name}"},
+            {"start": 2.5, "end": 5.0, "text": f"{os.path.getsize(audio_path)} bytes of audio"},
+        ]
+
+
+def make_transcriber(name=None):
+    name = name or TRANSCRIBER
+    if name == "whisper":
+        return WhisperS2TTranscriber()
+    if name == "stub":
+        return StubTranscriber(float(os.getenv("INGEST_STUB_DELAY_S", "0")))
+    raise ValueError(f"Unknown transcriber: {name}")
+
+
+# ---------------------------------------------------------------------------
+# Audio sources: anything with fetch(vod_id) -> local audio path
+# ---------------------------------------------------------------------------
+
+class YouTubeAudioSource:
+    """Downloads (or reuses the cached) 16 kHz mono WAV for a VOD."""
+
+    def fetch(self, vod_id):
+        audio_path = os.path.join(AUDIO_DIR, f"{vod_id}.wav")
+        if os.path.exists(audio_path):
+            print(f"[!] Audio already exists in cache: {vod_id}")
+            return audio_path
+        audio_path = download_audio(vod_id)
+        if audio_path is None:
+            raise RuntimeError("audio download failed")
+        return audio_path
+
+    def discard(self, audio_path):
+        """Delete a WAV once its transcript is saved; they are ~0.5 GB per long stream."""
+        try:
+            os.remove(audio_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalAudioSource:
+    """Reads <directory>/<vod_id>.wav; nothing is downloaded."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, vod_id):
+        audio_path = os.path.join(self.directory, f"{vod_id}.wav")
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(audio_path)
+        return audio_path
+
+    def discard(self, audio_path):
+        pass        # the caller's files, never deleted
+
+
+def make_audio_source(spec=None):
+    spec = spec or AUDIO_SOURCE
+    if spec == "youtube":
+        return YouTubeAudioSource()
+    if spec.startswith("local:"):
+        return LocalAudioSource(spec[len("local:"):])
+    raise ValueError(f"Unknown audio source: {spec}")
+
+
+_default_transcriber = None
+
 def transcribe_with_whisper_s2t(audio_path):
-    print("\n--- Starting Whisper-S2T (Optimized Pipeline) ---")
-    model = whisper_s2t.load_model(model_identifier="small", device="cuda", compute_type="float16")
-    
-    # Use the downloaded audio path
-    out = model.transcribe_with_vad(
-        [audio_path], 
-        lang_codes=['en'], 
-        tasks=['transcribe'], 
-        batch_size=16
-    )
-    
-    results = []
-    for segment in out[0]:
-        results.append({
-            "start": float(segment['start_time']),
-            "end": float(segment['end_time']),
-            "text": str(segment['text']).strip()
-        })
-    return results
\ No newline at end of file
+    global _default_transcriber
+    if _default_transcriber is None:
+        _default_transcriber = WhisperS2TTranscriber()
+    return _default_transcriber.transcribe(audio_path)
@@ -1,12 +1,24 @@
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 # from googleapiclient.discovery import build
 import database as db
+import ingest_jobs as jobs
 import transcribe as tc
+from ingest_pipeline import clean_quotes
 import yt_dlp
 
 CHANNEL_ID = 'UCDHABijvPBnJm7F-KlNME3w'
 CHANNEL_URL = 'https://www.youtube.com/@holoen_gigimurin/streams'
 
+# Ingest worker pipeline
+INGEST_PREFETCH = int(os.getenv("INGEST_PREFETCH", "2"))                   # VODs fetched ahead of the transcriber
+INGEST_DOWNLOAD_THREADS = int(os.getenv("INGEST_DOWNLOAD_THREADS", "2"))
+INGEST_DISK_BUDGET_MB = int(os.getenv("INGEST_DISK_BUDGET_MB", "4096"))    # audio waiting to be transcribed
+AUDIO_SIZE_ESTIMATE_MB = 500   # ~4 h of 16 kHz mono WAV, used until real sizes are seen
+
 def get_all_video_metadata(limit=None):
     """
     Returns a list of videos (id, title, thumbnail, upload_date).
@@ -58,52 +70,176 @@ def get_all_video_metadata(limit=None):
         except Exception as e:
             return f"An error occurred: {e}"
 
-def check_and_process_from_db():
+class _ClaimedJob:
+    def __init__(self, vod_id, title, attempts, future):
+        self.vod_id = vod_id
+        self.title = title or vod_id
+        self.attempts = attempts
+        self.future = future       # -> (audio_path, seconds spent fetching)
+
+
+class IngestWorker:
     """
-    Fetches videos already saved in the database and 
-    processes audio/transcription if they are missing.
+    Producer/consumer ingest. A bounded thread pool fetches (downloads and
+    transcodes) the audio of the next `prefetch` claimed jobs while this
+    thread runs the transcriber on the current one, so the accelerator isn't
+    idle during downloads. Prefetching also pauses while the audio waiting
+    on disk (real sizes of fetched files, an estimate for ones still
+    downloading) would exceed `disk_budget_mb`; each file is discarded once
+    its transcript is saved, so that is also the bound on audio kept on disk
+    (failed jobs keep theirs for the retry). All DB access stays on this
+    thread.
+
+    `transcriber` and `audio_source` are pluggable (see transcribe.py); e.g.
+    StubTranscriber + LocalAudioSource runs the whole pipeline on a CPU box.
     """
-    conn = db.connect()
-    cur = conn.cursor()
-
-    # 1. Fetch metadata directly from your video_catalog table
-    # Based on your image, columns are: vod_id, title, thumbnail, upload_date
-    cur.execute("SELECT vod_id, title FROM video_catalog ORDER BY upload_date DESC")
-    videos = cur.fetchall()
-
-    for video_id, title in videos:
-        print(f"--- PROCESSING: {title} ({video_id}) ---")
-
-        cur.execute("SELECT 1 FROM quotes WHERE vod_id = %s LIMIT 1", (video_id,))
-        # Skip video if transcriptions exists in database
-        if cur.fetchone():
-            print(f"[!] Transcription already exists in database. Skipping.")
-            continue
-
-        # Handle Audio Cache
-        file_name = f"{title}.wav"
-        file_path = os.path.join("audio_cache", file_name)
-
-        if os.path.exists(file_path):
-            print(f"[!] Audio already exists in cache: {title}")
-            audio_path = file_path
-        else:
-            audio_path = tc.download_audio(video_id)
-
-        # Process transcriptions
-        print(f"[→] Transcribing...")
+
+    def __init__(self, transcriber=None, audio_source=None, worker_id=None, prefetch=INGEST_PREFETCH,
+                 download_threads=INGEST_DOWNLOAD_THREADS, disk_budget_mb=INGEST_DISK_BUDGET_MB):
+        self.transcriber = transcriber or tc.make_transcriber()
+        self.audio_source = audio_source or tc.make_audio_source()
+        self.worker_id = worker_id or jobs.default_worker_id()
+        self.prefetch = max(0, prefetch)
+        self.download_threads = max(1, download_threads)
+        self.disk_budget = disk_budget_mb * 1024 * 1024
+        self.pending = deque()                 # claimed jobs, oldest first
+        self.seen_sizes = []                   # sizes of fetched audio, for the estimate
+        self.executor = None
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def _fetch(self, vod_id):
+        started = time.monotonic()
+        audio_path = self.audio_source.fetch(vod_id)
+        return audio_path, time.monotonic() - started
+
+    def _size_estimate(self):
+        recent = self.seen_sizes[-10:]
+        return sum(recent) / len(recent) if recent else AUDIO_SIZE_ESTIMATE_MB * 1024 * 1024
+
+    def _audio_bytes_waiting(self):
+        total = 0
+        for job in self.pending:
+            if not job.future.done():
+                total += self._size_estimate()
+            elif job.future.exception() is None:
+                total += os.path.getsize(job.future.result()[0])
+        return total
+
+    def _top_up(self, conn):
+        # Prefetched jobs can wait behind several transcriptions; keep their
+        # leases fresh so another worker doesn't reclaim them meanwhile
+        if self.pending:
+            jobs.renew_leases(conn, self.worker_id)
+        # The job about to be transcribed plus `prefetch` more behind it
+        while len(self.pending) < self.prefetch + 1:
+            if self.pending and self._audio_bytes_waiting() + self._size_estimate() > self.disk_budget:
+                break
+            claimed = jobs.claim_job(conn, self.worker_id)
+            if claimed is None:
+                break
+            vod_id, title, attempts = claimed
+            self.pending.append(_ClaimedJob(vod_id, title, attempts, self.executor.submit(self._fetch, vod_id)))
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def _process(self, conn, job):
+        print(f"--- PROCESSING: {job.title} ({job.vod_id}) ---")
+        timings, stage = {}, "downloading"
         try:
-            quotes = tc.transcribe_with_whisper_s2t(audio_path)
-            db.save_transcriptions(quotes, video_id)
-            print(f"  [+] Successfully saved quotes for: {title}")
+            waited = time.monotonic()
+            audio_path, fetch_s = job.future.result()
+            timings["downloading"] = round(fetch_s, 2)
+            # Time the transcriber sat idle on this download; ~0 once prefetch keeps up
+            timings["transcriber_wait"] = round(time.monotonic() - waited, 2)
+            self.seen_sizes.append(os.path.getsize(audio_path))
+
+            stage = "transcribing"
+            jobs.advance(conn, job.vod_id, self.worker_id, stage, timings)
+            print(f"[→] Transcribing...")
+            started = time.monotonic()
+            quotes = self.transcriber.transcribe(audio_path)
+            timings[stage] = round(time.monotonic() - started, 2)
+
+            stage = "post_processing"
+            jobs.advance(conn, job.vod_id, self.worker_id, stage, timings)
+            started = time.monotonic()
+            if db.save_transcriptions(clean_quotes(quotes), job.vod_id) is None:
+                raise RuntimeError("saving transcriptions failed")
+            # Transcribed audio isn't needed again; without this, disk use grows with
+            # every VOD and the budget below would only bound the prefetch queue
+            self.audio_source.discard(audio_path)
+            timings[stage] = round(time.monotonic() - started, 2)
+
+            jobs.advance(conn, job.vod_id, self.worker_id, "done", timings)
+            print(f"  [+] Successfully saved quotes for: {job.title} {timings}")
+            return True
         except Exception as e:
-            print(f"  [X] Failed to transcribe {video_id}: {e}")
-            
+            conn.rollback()
+            jobs.fail(conn, job.vod_id, self.worker_id, job.attempts, f"{stage}: {e}", timings)
+            return False
+        except BaseException:
+            # Ctrl-C / shutdown mid-job: hand it back now rather than when the lease expires
+            conn.rollback()
+            jobs.release(conn, job.vod_id, self.worker_id)
+            raise
+
+    def run(self, stop_when_idle=True, poll_s=60):
+        """
+        Process jobs until the queue is empty (or forever with
+        `stop_when_idle=False`). Several workers can run side by side.
+        """
+        conn = db.connect()
+        self.executor = ThreadPoolExecutor(max_workers=self.download_threads, thread_name_prefix="audio-fetch")
+        processed = 0
+        try:
+            while True:
+                self._top_up(conn)
+                if not self.pending:
+                    if stop_when_idle:
+                        break
+                    time.sleep(poll_s)
+                    jobs.enqueue_missing(conn)
+                    continue
+                job = self.pending.popleft()
+                # Start the next fetch before this transcription, not after
+                self._top_up(conn)
+                if self._process(conn, job):
+                    processed += 1
+        finally:
+            # Hand back whatever was claimed but not processed
+            for job in self.pending:
+                job.future.cancel()
+                jobs.release(conn, job.vod_id, self.worker_id)
+            self.pending.clear()
+            self.executor.shutdown(wait=True)
+            conn.close()
+        print(f"Ingest worker {self.worker_id} finished {processed} job(s).")
+        return processed
 
-    cur.close()
-    conn.close()
+
+def check_and_process_from_db():
+    """
+    Queues every catalog video that has no transcription yet and processes
+    the queue until it is empty.
+    """
+    conn = db.connect()
+    try:
+        jobs.enqueue_missing(conn)
+    finally:
+        conn.close()
+    return IngestWorker().run()
 
 if __name__ == "__main__":
+    # python yt_watcher.py worker   run a queue worker (start several for parallelism)
+    if sys.argv[1:] == ["worker"]:
+        check_and_process_from_db()
+        sys.exit(0)
+
     # Fetch all video metadata and save to database (for initial sync or testing)
     # extracted_data = get_all_video_metadata(limit=5)
     # db.save_vod_metadata(extracted_data)
@@ -116,7 +252,7 @@ if __name__ == "__main__":
     file_path = os.path.join("audio_cache", file_name)
     audio_path = file_path
     try:
-        quotes = tc.transcribe_with_whisper_s2t(audio_path)
+        quotes = clean_quotes(tc.transcribe_with_whisper_s2t(audio_path))
         db.save_transcriptions(quotes, id)
         print(f"  [+] Successfully saved quotes")
     except Exception as e:
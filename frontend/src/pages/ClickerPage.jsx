@@ -95,7 +95,9 @@ export default function ClickerPage() {
 
     // ── Socket.IO — chat only
     useEffect(() => {
-        socketRef.current = io('http://localhost:5000');
+        // WebSocket only: polling needs every request on the worker that issued the
+        // sid, which plain round-robin across uvicorn workers doesn't guarantee
+        socketRef.current = io('http://localhost:5000', { transports: ['websocket'] });
         socketRef.current.on('chat_message', (msg) => {
             setChatMessages((prev) => [...prev, msg].slice(-50));
         });
@@ -187,6 +187,7 @@ export default function HomePage({ randomMode = false }) {
     const [videos, setVideos] = useState([]);
     const [quotes, setQuotes] = useState([]);
     const [totalQuotes, setTotalQuotes] = useState(0);
+    const [totalIsApprox, setTotalIsApprox] = useState(false);
     const [totalPages, setTotalPages] = useState(1);
     const [activeTab, setActiveTab] = useState('Videos');
     const [shareTarget, setShareTarget] = useState(null);
@@ -275,6 +276,7 @@ export default function HomePage({ randomMode = false }) {
                     }
                     setQuotes(data.quote_results || []);
                     setTotalQuotes(data.total_quotes || 0);
+                    setTotalIsApprox(Boolean(data.total_is_approximate));
                     setTotalPages(parseInt(data.total_pages, 10) || 1);
                     scrollToControls();
                 })
@@ -432,7 +434,7 @@ export default function HomePage({ randomMode = false }) {
                             <div className="tabs-header">
                                 {[
                                     { id: 'Videos', count: videos.length, disabled: videos.length === 0 },
-                                    { id: 'Quotes', count: totalQuotes, disabled: totalQuotes === 0 },
+                                    { id: 'Quotes', count: totalIsApprox ? `${totalQuotes}+` : totalQuotes, disabled: totalQuotes === 0 },
                                 ].map(({ id, count, disabled }) => (
                                     <button
                                         key={id}
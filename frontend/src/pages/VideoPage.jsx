@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { useParams } from 'react-router-dom';
 import '../static/css/VideoPage.css';
-import { formatDate, formatTime } from '../utils.js';
+import { formatDate, formatTime, fetchTranscript } from '../utils.js';
 import Navbar from '../components/Navbar';
 import TranscriptSearch from '../components/VideoSearchModal';
 
@@ -74,7 +74,7 @@ export default function VideoPage() {
     const fetchVideoData = useCallback(() => {
         setIsLoading(true);
         setError(null);
-        fetch(`/api/video/${vod_id}`)
+        fetchTranscript(vod_id)
             .then(r => {
                 if (!r.ok) throw new Error('Failed to load transcripts.');
                 return r.json();
@@ -25,4 +25,17 @@ export function formatTime(seconds) {
     const mm = String(m).padStart(2, '0');
     const ss = String(sec).padStart(2, '0');
     return h > 0 ? `${h}:${mm}:${ss}` : `${m}:${ss}`;
-}
\ No newline at end of file
+}
+
+// Build with VITE_STATIC_TRANSCRIPTS=true to read transcripts from the
+// pre-compressed files nginx serves under /transcripts/ instead of the API.
+export const STATIC_TRANSCRIPTS = import.meta.env.VITE_STATIC_TRANSCRIPTS === 'true';
+
+export function fetchTranscript(vod_id) {
+    const fromApi = () => fetch(`/api/video/${vod_id}`);
+    if (!STATIC_TRANSCRIPTS) return fromApi();
+    // A VOD that hasn't been exported yet falls back to the API
+    return fetch(`/transcripts/videos/${vod_id}.json`)
+        .then(r => (r.ok ? r : fromApi()))
+        .catch(fromApi);
+}